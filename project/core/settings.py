@@ -141,18 +141,98 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", default="redis://redis:6379")
 
 CELERY_BEAT_SCHEDULE = {
-    "process_task_schedules_every_minute": {
-        "task": "core.tasks.schedule_tasks",
+    "reap_stuck_tasks_every_minute": {
+        "task": "core.tasks.reap_tasks",
         "schedule": crontab(minute="*/1"),  # Runs every minute
     },
 }
 
+# Number of schedules processed in a single transaction by process_task_schedules
+TASK_SCHEDULES_BATCH_SIZE = int(os.getenv("TASK_SCHEDULES_BATCH_SIZE", default=100))
+# Seconds after which process_task_schedules and the schedule_tasks shards stop draining due schedules
+TASK_SCHEDULES_TIME_BUDGET = float(os.getenv("TASK_SCHEDULES_TIME_BUDGET", default=50))
+# Seconds ahead for which the run_scheduler service keeps the upcoming schedule runs in memory
+TASK_SCHEDULER_HORIZON = float(os.getenv("TASK_SCHEDULER_HORIZON", default=300))
+# Maximum seconds the run_scheduler service waits before reconnecting when the database fails
+TASK_SCHEDULER_MAX_BACKOFF = float(os.getenv("TASK_SCHEDULER_MAX_BACKOFF", default=30))
+# Seconds a claimed schedule is hidden from the other schedulers while its tasks are created
+TASK_SCHEDULES_LEASE = int(os.getenv("TASK_SCHEDULES_LEASE", default=60))
+# Seconds by which every priority level above the lowest moves a due schedule ahead when process_task_schedules picks a batch
+TASK_SCHEDULES_PRIORITY_AGING = int(
+    os.getenv("TASK_SCHEDULES_PRIORITY_AGING", default=60)
+)
+# Number of shard tasks schedule_tasks fans out to, so schedules are processed by several workers
+TASK_SCHEDULES_SHARDS = int(os.getenv("TASK_SCHEDULES_SHARDS", default=1))
+
+# Number of lines of a streamed tasks batch which are validated and inserted together
+TASKS_STREAM_CHUNK_SIZE = int(os.getenv("TASKS_STREAM_CHUNK_SIZE", default=1000))
+
+# How created tasks are sent to processing: "single" (a message per task) or "batch"
+TASKS_DISPATCH_MODE = os.getenv("TASKS_DISPATCH_MODE", default="single")
+# Maximum number of tasks processed by a single message in the "batch" dispatch mode
+TASKS_DISPATCH_BATCH_SIZE = int(os.getenv("TASKS_DISPATCH_BATCH_SIZE", default=100))
+
+# Opt-in cache of the operation results, with an in-process tier and a Redis tier on the broker instance
+TASKS_RESULT_CACHE_ENABLED = bool(
+    int(os.getenv("TASKS_RESULT_CACHE_ENABLED", default=0))
+)
+# Seconds after which a cached result expires
+TASKS_RESULT_CACHE_TTL = int(os.getenv("TASKS_RESULT_CACHE_TTL", default=3600))
+# Maximum number of results kept by the in-process tier of every worker
+TASKS_RESULT_CACHE_LOCAL_SIZE = int(
+    os.getenv("TASKS_RESULT_CACHE_LOCAL_SIZE", default=10000)
+)
+
+# Number of latest tasks embedded in a retrieved task schedule, the rest are paginated
+TASK_SCHEDULE_LATEST_TASKS_COUNT = int(
+    os.getenv("TASK_SCHEDULE_LATEST_TASKS_COUNT", default=10)
+)
+
+# Default number of tasks and task schedules per page of the list endpoints
+TASKS_PAGE_SIZE = int(os.getenv("TASKS_PAGE_SIZE", default=100))
+
+# Maximum number of task ids looked up by a single bulk status request
+TASKS_BULK_STATUS_MAX_IDS = int(os.getenv("TASKS_BULK_STATUS_MAX_IDS", default=5000))
+
+# Redis on which the status transitions of the tasks are published for the event streams
+TASKS_EVENTS_REDIS_URL = os.getenv("TASKS_EVENTS_REDIS_URL", default=CELERY_BROKER_URL)
+# Seconds after which an event stream is closed
+TASKS_EVENTS_TIMEOUT = float(os.getenv("TASKS_EVENTS_TIMEOUT", default=300))
+# Seconds without events after which a heartbeat is sent to keep the stream open
+TASKS_EVENTS_HEARTBEAT = float(os.getenv("TASKS_EVENTS_HEARTBEAT", default=15))
+
+# Number of outbox messages published to the broker in a single transaction
+TASKS_OUTBOX_BATCH_SIZE = int(os.getenv("TASKS_OUTBOX_BATCH_SIZE", default=1000))
+# Seconds the outbox relay waits for new messages once the outbox is drained
+TASKS_OUTBOX_POLL_INTERVAL = float(os.getenv("TASKS_OUTBOX_POLL_INTERVAL", default=0.5))
+# Maximum seconds the outbox relay waits before retrying when the broker or the database fails
+TASKS_OUTBOX_MAX_BACKOFF = float(os.getenv("TASKS_OUTBOX_MAX_BACKOFF", default=30))
+# Seconds the sent outbox messages are kept for
+TASKS_OUTBOX_RETENTION = int(os.getenv("TASKS_OUTBOX_RETENTION", default=86400))
+
+# Seconds a task can stay pending or started before it is sent to processing again
+TASKS_LEASE = int(os.getenv("TASKS_LEASE", default=600))
+# Number of stuck tasks sent to processing again in a single transaction
+TASKS_REAPER_BATCH_SIZE = int(os.getenv("TASKS_REAPER_BATCH_SIZE", default=1000))
+
+# Opt-in routing of the tasks to the tasks-high, tasks and tasks-low queues, so workers can be reserved for the high
+# priorities. Off by default, as the workers already read priority 0 of all their queues first and the simulated
+# reserved workers don't lower the latency of the high priorities while delaying the low ones
+TASKS_PRIORITY_QUEUES_ENABLED = bool(
+    int(os.getenv("TASKS_PRIORITY_QUEUES_ENABLED", default=0))
+)
+# Tasks with at most this priority are routed to the tasks-high queue, as the broker serves priority 0 first
+TASKS_HIGH_PRIORITY = int(os.getenv("TASKS_HIGH_PRIORITY", default=2))
+# Tasks with at least this priority are routed to the tasks-low queue, the others to the tasks queue
+TASKS_LOW_PRIORITY = int(os.getenv("TASKS_LOW_PRIORITY", default=7))
+
 CELERY_TASK_QUEUES = {
-    "tasks": {
-        "exchange": "tasks",
-        "routing_key": "tasks",
+    queue: {
+        "exchange": queue,
+        "routing_key": queue,
         "queue_arguments": {"x-max-priority": 10},  # Max priority for this queue
-    },
+    }
+    for queue in ("tasks-high", "tasks", "tasks-low")
 }
 
 CELERY_BROKER_TRANSPORT_OPTIONS = {
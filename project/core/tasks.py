@@ -1,15 +1,30 @@
 import random
 import time
 
+from celery import group
 from celery.utils.log import get_task_logger
 from django.conf import settings
 from django.core.management import call_command
+from django.utils.timezone import now
 
 from core.celery import app
+from tasks.operations import evaluate_operation
+from tasks.result_cache import result_cache
 
 logger = get_task_logger(__name__)
 
 
+def get_cached_results(operations: list[str]) -> dict[str, float]:
+    if not settings.TASKS_RESULT_CACHE_ENABLED:
+        return {}
+    return result_cache.get_many(operations)
+
+
+def cache_results(results: dict[str, float]) -> None:
+    if settings.TASKS_RESULT_CACHE_ENABLED and results:
+        result_cache.set_many(results)
+
+
 @app.task(
     bind=True,
     autoretry_for=(Exception,),
@@ -21,27 +36,32 @@ def process_task(self, task_id: int) -> None:
     if not settings.TESTING and not random.choice([0, 1]):
         raise Exception()
 
+    from tasks.events import task_event_publisher
     from tasks.models import Task, TaskStatus
 
-    time.sleep(
-        10
-    )  # Add sleep to simulate complex computation which can also lead to a race condition if the task is deleted in the meantime
-
-    try:
-        task = Task.objects.get(task_id=task_id)
-    except Task.DoesNotExist:
-        logger.error(f"Task with id {task_id} was deleted in the meantime.")
+    # The task can only be started while it is pending, which also protects it from being deleted
+    started_tasks = Task.objects.start([task_id])
+    if not started_tasks:
+        logger.error(
+            f"Task with id {task_id} was deleted or processed in the meantime."
+        )
         return
 
-    task.status = TaskStatus.STARTED
-    task.save()
+    task_event_publisher.publish(started_tasks)
+    (task,) = started_tasks
     logger.info(
         f"Start processing task with id: {task_id} which has priority: {task.priority}"
     )
 
+    cached_results = get_cached_results([task.operation])
+    if not cached_results:
+        time.sleep(10)  # Add sleep to simulate complex computation
+
     try:
-        operands = task.operation.split("+")
-        result = sum(float(operand) for operand in operands)
+        result = cached_results.get(task.operation)
+        if result is None:
+            result = evaluate_operation(task.operation)
+            cache_results({task.operation: result})
 
         task.result = result
         task.status = TaskStatus.SUCCESS
@@ -50,11 +70,112 @@ def process_task(self, task_id: int) -> None:
         task.status = TaskStatus.ERROR
         logger.error(f"Error processing task {task_id}: {e}")
     finally:
-        task.save()
+        if Task.objects.filter(task_id=task_id, status=TaskStatus.STARTED).update(
+            status=task.status, result=task.result, updated_at=now()
+        ):
+            task_event_publisher.publish([task])
+
+
+@app.task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 5},
+)
+def process_task_batch(self, task_ids: list[int]) -> None:
+    # added only for retry exemplification
+    if not settings.TESTING and not random.choice([0, 1]):
+        raise Exception()
+
+    from tasks.events import task_event_publisher
+    from tasks.models import Task, TaskStatus
+
+    tasks = Task.objects.start(task_ids)
+    skipped_task_ids = set(task_ids) - {task.task_id for task in tasks}
+    if skipped_task_ids:
+        logger.error(
+            f"Tasks with ids {sorted(skipped_task_ids)} were deleted or processed in the meantime."
+        )
+    if not tasks:
+        return
+
+    task_event_publisher.publish(tasks)
+    logger.info(
+        f"Start processing {len(tasks)} tasks which have priority: {tasks[0].priority}"
+    )
+
+    cached_results = get_cached_results([task.operation for task in tasks])
+    if any(task.operation not in cached_results for task in tasks):
+        time.sleep(10)  # Add sleep to simulate complex computation
+
+    computed_results = {}
+    for task in tasks:
+        try:
+            result = cached_results.get(task.operation)
+            if result is None:
+                result = evaluate_operation(task.operation)
+                computed_results[task.operation] = result
+
+            task.result = result
+            task.status = TaskStatus.SUCCESS
+        except Exception as e:
+            task.status = TaskStatus.ERROR
+            logger.error(f"Error processing task {task.task_id}: {e}")
+    cache_results(computed_results)
+
+    # Only the tasks which are still started are saved and published, like in process_task
+    finished_tasks = Task.objects.finish(tasks)
+    skipped_task_ids = {task.task_id for task in tasks} - {
+        task.task_id for task in finished_tasks
+    }
+    if skipped_task_ids:
+        logger.error(
+            f"Tasks with ids {sorted(skipped_task_ids)} were deleted or sent to processing again in the meantime."
+        )
+    task_event_publisher.publish(finished_tasks)
+    logger.info(f"Tasks {[task.task_id for task in finished_tasks]} were processed.")
 
 
 @app.task
-def schedule_tasks() -> None:
+def schedule_tasks(
+    batch_size: int | None = None,
+    time_budget: float | None = None,
+    shard: int | None = None,
+    shards: int | None = None,
+) -> None:
+    shards = shards or settings.TASK_SCHEDULES_SHARDS
+    if shard is None and shards > 1:
+        # Fan out a task per shard, so the schedules are processed concurrently by the workers
+        group(
+            schedule_tasks.s(
+                batch_size=batch_size,
+                time_budget=time_budget,
+                shard=shard_index,
+                shards=shards,
+            )
+            for shard_index in range(shards)
+        ).apply_async()
+        return
+
+    options = {
+        "batch_size": batch_size,
+        "time_budget": time_budget,
+        "shard": shard,
+        "shards": shards,
+    }
     call_command(
         "process_task_schedules",
+        **{name: value for name, value in options.items() if value is not None},
+    )
+
+
+@app.task
+def reap_tasks(batch_size: int | None = None) -> dict[str, int]:
+    from tasks.dispatch import reap_stuck_tasks
+
+    reaped = reap_stuck_tasks(batch_size or settings.TASKS_REAPER_BATCH_SIZE)
+    logger.info(
+        f"Reaped {sum(reaped.values())} stuck tasks: "
+        + ", ".join(f"{count} {status}" for status, count in reaped.items())
     )
+    return reaped
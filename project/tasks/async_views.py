@@ -0,0 +1,110 @@
+"""
+Async variants of the task submission and retrieval endpoints, served by an ASGI server.
+
+They accept and return the same payloads as TaskViewSet, but use the async ORM, so a
+request waiting on the database doesn't hold a thread. Like the sync views, they write the
+tasks together with their outbox messages and leave the publishing to the outbox relay.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import HttpRequest, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import serializers, status
+from rest_framework.utils.encoders import JSONEncoder
+
+from tasks.dispatch import DispatchMode, dispatch_tasks
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
+
+
+@sync_to_async
+def save_tasks(
+    serializer: serializers.BaseSerializer, dispatch_mode: DispatchMode | None
+) -> list[Task]:
+    # Transactions are bound to a thread, so the tasks and their outbox messages are saved in one
+    with transaction.atomic():
+        saved = serializer.save()
+        tasks = saved if isinstance(saved, list) else [saved]
+        dispatch_tasks(tasks, dispatch_mode)
+
+    return tasks
+
+
+def json_response(data: dict | list, status_code: int) -> JsonResponse:
+    return JsonResponse(data, encoder=JSONEncoder, status=status_code, safe=False)
+
+
+@csrf_exempt
+@require_POST
+async def create_task(request: HttpRequest) -> JsonResponse:
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return json_response(
+            {"detail": "Request body must be JSON."}, status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer = TaskSerializer(data=data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    await save_tasks(serializer, DispatchMode.SINGLE)
+
+    return json_response(serializer.data, status.HTTP_202_ACCEPTED)
+
+
+@require_GET
+async def retrieve_task(request: HttpRequest, task_id: int) -> JsonResponse:
+    task = await Task.objects.filter(task_id=task_id).afirst()
+    if task is None:
+        return json_response(
+            {"detail": "No Task matches the given query."}, status.HTTP_404_NOT_FOUND
+        )
+
+    return json_response(TaskSerializer(task).data, status.HTTP_200_OK)
+
+
+@csrf_exempt
+@require_POST
+async def batch_request(request: HttpRequest) -> JsonResponse:
+    try:
+        tasks_data = json.loads(request.body)
+    except ValueError:
+        tasks_data = None
+    if not isinstance(tasks_data, list) or len(tasks_data) > 100:
+        return json_response(
+            ["Request body must be a list of up to 100 tasks."],
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    dispatch_mode = request.GET.get("dispatch")
+    try:
+        dispatch_mode = DispatchMode(dispatch_mode) if dispatch_mode else None
+    except ValueError:
+        return json_response(
+            [f"Dispatch must be one of: {', '.join(DispatchMode)}."],
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Invalid tasks are collected in item_errors instead of failing the batch
+    serializer = TaskSerializer(data=tasks_data, many=True)
+    serializer.is_valid()
+
+    created_tasks = await save_tasks(serializer, dispatch_mode)
+
+    response_data = {"tasks": serializer.data}
+    if serializer.item_errors:
+        response_data["errors"] = serializer.item_errors
+
+    return json_response(
+        response_data,
+        (
+            status.HTTP_202_ACCEPTED
+            if len(created_tasks) > 0 or len(serializer.item_errors) == 0
+            else status.HTTP_400_BAD_REQUEST
+        ),
+    )
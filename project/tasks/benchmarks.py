@@ -0,0 +1,574 @@
+"""
+Benchmarks which are not part of the regular test suite.
+
+They run against the test database and are started explicitly with:
+python manage.py test tasks.benchmarks
+"""
+
+import asyncio
+import heapq
+import multiprocessing
+import os
+import random
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from typing import Any, Callable
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import AsyncClient, Client, SimpleTestCase, TransactionTestCase
+from django.utils.timezone import now
+from rest_framework.serializers import ListSerializer
+
+from tasks.models import Task, TaskSchedule, TaskStatus
+from tasks.scheduling import PRIORITY_LEVELS, due_schedules
+from tasks.serializers import TaskSerializer
+from tasks.timing_wheel import TimingWheel
+
+SCHEDULES_COUNT = int(os.getenv("BENCHMARK_SCHEDULES_COUNT", default=20000))
+TASKS_COUNT = int(os.getenv("BENCHMARK_TASKS_COUNT", default=1_000_000))
+REQUESTS_COUNT = int(os.getenv("BENCHMARK_REQUESTS_COUNT", default=2000))
+CONCURRENCY = int(os.getenv("BENCHMARK_CONCURRENCY", default=50))
+SERIALIZED_COUNT = int(os.getenv("BENCHMARK_SERIALIZED_COUNT", default=10000))
+SIMULATED_SECONDS = int(os.getenv("BENCHMARK_SIMULATED_SECONDS", default=3600))
+WHEEL_SCHEDULES_COUNT = int(
+    os.getenv("BENCHMARK_WHEEL_SCHEDULES_COUNT", default=1_000_000)
+)
+
+
+def process_schedules_shard(shard: int, shards: int) -> None:
+    call_command(
+        "process_task_schedules",
+        shard=shard,
+        shards=shards,
+        batch_size=500,
+        time_budget=3600,
+        stdout=StringIO(),
+    )
+    connections.close_all()
+
+
+class ShardedSchedulingBenchmark(TransactionTestCase):
+    """
+    Measures the schedules/s of process_task_schedules run by 1, 2 and 4 workers, each one
+    processing its shard of BENCHMARK_SCHEDULES_COUNT due schedules.
+    """
+
+    def test_throughput_scales_with_workers(self) -> None:
+        TaskSchedule.objects.bulk_create(
+            (
+                TaskSchedule(operation="1+1", priority=1, every_x_hours=1)
+                for _ in range(SCHEDULES_COUNT)
+            ),
+            batch_size=5000,
+        )
+
+        throughputs = {}
+        for workers in (1, 2, 4):
+            Task.objects.all().delete()
+            TaskSchedule.objects.update(
+                schedule_x_times=1,
+                next_run_at=now() - timedelta(minutes=1),
+                tasks_created=0,
+                last_task_created_at=None,
+            )
+            # Worker processes are forked, so they must not share the parent connection
+            connections.close_all()
+
+            started_at = time.monotonic()
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                pool.starmap(
+                    process_schedules_shard,
+                    [(shard, workers) for shard in range(workers)],
+                )
+            duration = time.monotonic() - started_at
+
+            self.assertEqual(Task.objects.count(), SCHEDULES_COUNT)
+            throughputs[workers] = SCHEDULES_COUNT / duration
+            print(
+                f"{workers} worker(s): {SCHEDULES_COUNT} schedules in {duration:.2f}s "
+                f"({throughputs[workers]:.0f} schedules/s, "
+                f"{throughputs[workers] / throughputs[1]:.2f}x)"
+            )
+
+        # The shards don't contend for the same rows, so every doubling of the workers has to
+        # bring most of a doubling of the throughput, as long as there are CPUs to run them
+        cpus = os.cpu_count() or 1
+        for workers in (2, 4):
+            if workers <= cpus:
+                self.assertGreater(
+                    throughputs[workers], throughputs[workers // 2] * 1.4
+                )
+            else:
+                print(f"Scaling to {workers} workers isn't asserted with {cpus} CPU(s)")
+
+
+class TaskIndexesBenchmark(TransactionTestCase):
+    """
+    Asserts that the hot queries on a large tasks table are served by index scans.
+
+    The table is seeded with BENCHMARK_TASKS_COUNT tasks (a million by default) spread over
+    a thousand schedules, with 1% of them unfinished. The schedules table is seeded with
+    BENCHMARK_SCHEDULES_COUNT more schedules, with 10% of them due and 1% of them above the
+    lowest priority, like a backlog of low priority schedules. Both are analyzed before reading
+    the plans.
+    """
+
+    def setUp(self) -> None:
+        schedules = TaskSchedule.objects.bulk_create(
+            TaskSchedule(operation="1+1", priority=1, every_x_hours=1, next_run_at=None)
+            for _ in range(1000)
+        )
+        self.schedule = schedules[0]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {TaskSchedule._meta.db_table}
+                    (operation, priority, every_x_hours, schedule_x_times, checked_scheduling_at,
+                    next_run_at, tasks_created)
+                SELECT
+                    '1+1',
+                    CASE WHEN i %% 100 = 0 THEN i / 100 %% 9 ELSE 9 END,
+                    1,
+                    1,
+                    now(),
+                    CASE
+                        WHEN i %% 10 = 0 THEN now() - i * interval '1 second'
+                        ELSE now() + i * interval '1 second'
+                    END,
+                    0
+                FROM generate_series(1, %s) AS i
+                """,
+                [SCHEDULES_COUNT],
+            )
+            cursor.execute(f"ANALYZE {TaskSchedule._meta.db_table}")
+            cursor.execute(
+                f"""
+                INSERT INTO {Task._meta.db_table}
+                    (operation, priority, status, created_at, updated_at, dispatched_at, task_schedule_id)
+                SELECT
+                    '1+1',
+                    i %% 10,
+                    CASE WHEN i %% 100 = 0 THEN %s ELSE %s END,
+                    now() - i * interval '1 second',
+                    now() - i * interval '1 second',
+                    CASE WHEN i %% 100 = 0 THEN now() - i * interval '1 second' END,
+                    %s + i %% 1000
+                FROM generate_series(1, %s) AS i
+                """,
+                [
+                    TaskStatus.PENDING,
+                    TaskStatus.SUCCESS,
+                    self.schedule.task_schedule_id,
+                    TASKS_COUNT,
+                ],
+            )
+            cursor.execute(f"ANALYZE {Task._meta.db_table}")
+
+    def assertUsesIndex(self, plan: str, index_name: str) -> None:
+        self.assertIn(f"Index Scan using {index_name}", plan.replace("Only ", ""), plan)
+
+    def test_hot_queries_use_index_scans(self) -> None:
+        # Oldest due schedules of a priority, as claimed by process_task_schedules
+        with transaction.atomic():
+            self.assertUsesIndex(
+                due_schedules(now(), shard=0, shards=1, priority=0)
+                .values_list("task_schedule_id", "next_run_at")[:100]
+                .explain(),
+                "taskschedule_priority_idx",
+            )
+        # Latest tasks of a schedule, as prefetched by the task schedule endpoints
+        self.assertUsesIndex(
+            Task.objects.filter(task_schedule=self.schedule)
+            .order_by("-created_at")[:1]
+            .explain(),
+            "task_schedule_created_at_idx",
+        )
+        # Oldest unfinished tasks, as used for monitoring
+        self.assertUsesIndex(
+            Task.objects.filter(status=TaskStatus.PENDING)
+            .order_by("created_at")[:100]
+            .explain(),
+            "task_unfinished_status_idx",
+        )
+        # Stuck tasks, as swept by the reaper
+        self.assertUsesIndex(
+            Task.objects.filter(
+                status=TaskStatus.PENDING,
+                dispatched_at__lt=now() - timedelta(minutes=10),
+            )
+            .order_by("dispatched_at")[:1000]
+            .explain(),
+            "task_pending_dispatched_at_idx",
+        )
+        self.assertUsesIndex(
+            Task.objects.filter(
+                status=TaskStatus.STARTED, updated_at__lt=now() - timedelta(minutes=10)
+            )
+            .order_by("updated_at")[:1000]
+            .explain(),
+            "task_unfinished_updated_at_idx",
+        )
+        # First page of the tasks list endpoint
+        self.assertUsesIndex(
+            Task.objects.order_by("-created_at", "-task_id")[:100].explain(),
+            "task_created_at_idx",
+        )
+
+
+class AsyncViewsLoadBenchmark(TransactionTestCase):
+    """
+    Compares the requests/s and p99 latency of the sync (WSGI) and async (ASGI) task views.
+
+    BENCHMARK_REQUESTS_COUNT requests are sent with BENCHMARK_CONCURRENCY in flight, through
+    threads for the WSGI handler and coroutines for the ASGI handler. The HTTP servers are
+    left out, only the request handling of the two paths is measured.
+    """
+
+    def setUp(self) -> None:
+        self.task = Task.objects.create(operation="1+1", priority=1)
+
+    def report(self, name: str, latencies: list[float], duration: float) -> None:
+        latencies = sorted(latencies)
+        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+        print(
+            f"{name}: {len(latencies) / duration:.0f} requests/s, "
+            f"p99 latency {p99 * 1000:.1f}ms"
+        )
+
+    def run_sync(self, path: str, data: dict | None = None) -> None:
+        def send(_: int) -> float:
+            started_at = time.perf_counter()
+            if data is None:
+                response = Client().get(path)
+            else:
+                response = Client().post(path, data, content_type="application/json")
+            self.assertLess(response.status_code, 300)
+            return time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(CONCURRENCY) as executor:
+            latencies = list(executor.map(send, range(REQUESTS_COUNT)))
+        self.report(f"WSGI {path}", latencies, time.perf_counter() - started_at)
+
+    def run_async(self, path: str, data: dict | None = None) -> None:
+        async def send_all() -> list[float]:
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(CONCURRENCY)
+
+            async def send() -> float:
+                async with semaphore:
+                    started_at = time.perf_counter()
+                    if data is None:
+                        response = await client.get(path)
+                    else:
+                        response = await client.post(
+                            path, data, content_type="application/json"
+                        )
+                    self.assertLess(response.status_code, 300)
+                    return time.perf_counter() - started_at
+
+            return await asyncio.gather(*(send() for _ in range(REQUESTS_COUNT)))
+
+        started_at = time.perf_counter()
+        latencies = async_to_sync(send_all)()
+        self.report(f"ASGI {path}", latencies, time.perf_counter() - started_at)
+
+    def test_create_task(self) -> None:
+        self.run_sync("/tasks/", {"operation": "1+1", "priority": 1})
+        self.run_async("/async/tasks/", {"operation": "1+1", "priority": 1})
+
+    def test_retrieve_task(self) -> None:
+        self.run_sync(f"/tasks/{self.task.task_id}/")
+        self.run_async(f"/async/tasks/{self.task.task_id}/")
+
+
+class TaskSerializationBenchmark(SimpleTestCase):
+    """
+    Compares the per-task cost of validating and outputting a batch with the DRF fields of
+    TaskSerializer and with the fast path of TaskListSerializer.
+    """
+
+    def measure(self, name: str, function: Callable[[], Any]) -> float:
+        started_at = time.perf_counter()
+        function()
+        per_task = (time.perf_counter() - started_at) / SERIALIZED_COUNT
+        print(f"{name}: {per_task * 1_000_000:.1f}us per task")
+        return per_task
+
+    def test_validation(self) -> None:
+        tasks_data = [
+            {"operation": f"{index}+1", "priority": index % 10}
+            for index in range(SERIALIZED_COUNT)
+        ]
+
+        drf_cost = self.measure(
+            "DRF fields validation",
+            lambda: ListSerializer(child=TaskSerializer(), data=tasks_data).is_valid(
+                raise_exception=True
+            ),
+        )
+        fast_cost = self.measure(
+            "Fast path validation",
+            lambda: TaskSerializer(data=tasks_data, many=True).is_valid(
+                raise_exception=True
+            ),
+        )
+
+        self.assertLess(fast_cost, drf_cost)
+
+    def test_representation(self) -> None:
+        created_at = now()
+        tasks = [
+            Task(
+                task_id=index,
+                operation=f"{index}+1",
+                priority=index % 10,
+                status=TaskStatus.SUCCESS,
+                result=index + 1,
+                created_at=created_at,
+            )
+            for index in range(SERIALIZED_COUNT)
+        ]
+
+        drf_cost = self.measure(
+            "DRF fields representation",
+            lambda: ListSerializer(child=TaskSerializer(), instance=tasks).data,
+        )
+        fast_cost = self.measure(
+            "Fast path representation",
+            lambda: TaskSerializer(tasks, many=True).data,
+        )
+
+        self.assertLess(fast_cost, drf_cost)
+
+
+class TimingWheelBenchmark(SimpleTestCase):
+    """
+    Measures the insert, cancel and tick cost and the memory footprint of a timing wheel
+    holding BENCHMARK_WHEEL_SCHEDULES_COUNT runs of hourly and daily schedules, spread over
+    the next 30 days, next to rebuilding a heap of the same runs.
+    """
+
+    def setUp(self) -> None:
+        self.start = time.time()
+        generator = random.Random(0)
+        self.runs = [
+            (
+                self.start
+                + generator.randrange(30 * 24) * 3600
+                + generator.uniform(0, 3600),
+                task_schedule_id,
+            )
+            for task_schedule_id in range(WHEEL_SCHEDULES_COUNT)
+        ]
+
+    def measure(self, name: str, count: int, function: Callable[[], Any]) -> Any:
+        started_at = time.perf_counter()
+        result = function()
+        duration = time.perf_counter() - started_at
+        print(
+            f"{name}: {duration:.3f}s, {duration / count * 1_000_000:.2f}us per operation"
+        )
+        return result
+
+    def fill(self, wheel: TimingWheel) -> None:
+        for due_at, task_schedule_id in self.runs:
+            wheel.add(task_schedule_id, due_at)
+
+    def test_timing_wheel(self) -> None:
+        tracemalloc.start()
+        wheel = TimingWheel(self.start)
+        self.fill(wheel)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del wheel
+        print(f"Memory: {memory / WHEEL_SCHEDULES_COUNT:.0f} bytes per schedule")
+
+        wheel = TimingWheel(self.start)
+        self.measure("Insert", WHEEL_SCHEDULES_COUNT, lambda: self.fill(wheel))
+
+        # A day of ticks, with the runs of the hours and minutes moved down as they are reached
+        ticks = 86400
+        due_count = self.measure(
+            "Tick",
+            ticks,
+            lambda: sum(
+                len(wheel.advance(self.start + second))
+                for second in range(1, ticks + 1)
+            ),
+        )
+        self.assertEqual(
+            due_count, sum(due_at <= self.start + ticks for due_at, _ in self.runs)
+        )
+
+        remaining_ids = [
+            task_schedule_id
+            for _, task_schedule_id in self.runs
+            if task_schedule_id in wheel
+        ]
+        self.measure(
+            "Cancel",
+            len(remaining_ids),
+            lambda: [
+                wheel.cancel(task_schedule_id) for task_schedule_id in remaining_ids
+            ],
+        )
+        self.assertEqual(len(wheel), 0)
+
+    def test_heap_rebuild(self) -> None:
+        def rebuild() -> None:
+            heap = list(self.runs)
+            heapq.heapify(heap)
+
+        self.measure("Heap rebuild", WHEEL_SCHEDULES_COUNT, rebuild)
+
+
+class PriorityFairnessBenchmark(SimpleTestCase):
+    """
+    Simulates a backlog and reports the latency percentiles of every priority.
+
+    The first simulation picks due schedules by due time and by the weighted fair order of
+    process_task_schedules. The second one processes tasks with the workers sharing a single
+    queue and with the priority queues, consumed by reserved and shared workers.
+    """
+
+    def setUp(self) -> None:
+        self.generator = random.Random(0)
+
+    def percentile(self, latencies: list[float], q: float) -> float:
+        return sorted(latencies)[int(len(latencies) * q)]
+
+    def report(self, name: str, latencies: dict[int, list[float]]) -> None:
+        print(name)
+        for priority, priority_latencies in sorted(latencies.items()):
+            p50, p99 = (self.percentile(priority_latencies, q) for q in (0.5, 0.99))
+            print(f"  priority {priority}: p50 {p50:.0f}s, p99 {p99:.0f}s")
+
+    def select_schedules(self, aging: float) -> dict[int, list[float]]:
+        # 120 schedules become due every second and 100 are processed, during the simulated time
+        generator = random.Random(0)
+        waiting_schedules: list[tuple[float, float, int, int]] = []
+        latencies: dict[int, list[float]] = {priority: [] for priority in range(10)}
+        second = 0
+        while second < SIMULATED_SECONDS or waiting_schedules:
+            if second < SIMULATED_SECONDS:
+                for _ in range(120):
+                    priority = generator.randrange(10)
+                    heapq.heappush(
+                        waiting_schedules,
+                        (
+                            second - PRIORITY_LEVELS[priority] * aging,
+                            generator.random(),
+                            priority,
+                            second,
+                        ),
+                    )
+            for _ in range(min(100, len(waiting_schedules))):
+                _, _, priority, due_at = heapq.heappop(waiting_schedules)
+                latencies[priority].append(second - due_at)
+            second += 1
+        return latencies
+
+    def test_schedule_selection(self) -> None:
+        due_order = self.select_schedules(aging=0)
+        weighted_order = self.select_schedules(
+            aging=settings.TASK_SCHEDULES_PRIORITY_AGING
+        )
+        self.report("Due order", due_order)
+        self.report("Weighted fair order", weighted_order)
+
+        self.assertLess(max(weighted_order[0]), max(due_order[0]))
+        # The lower priorities age, so they are delayed by a bounded time instead of starving
+        self.assertLessEqual(
+            max(weighted_order[9]),
+            max(due_order[9]) + 9 * settings.TASK_SCHEDULES_PRIORITY_AGING,
+        )
+
+    def process_tasks(
+        self, queues: list[range], pools: list[tuple[list[int], int]]
+    ) -> dict[int, list[float]]:
+        """
+        Simulates 10s tasks created at 0.7 per second with uniform priorities, plus a burst of a
+        priority 9 task per second during the first tenth of the time. Like the Redis transport,
+        every pool of workers serves priority 0 of all its queues first, then priority 1, etc.
+        """
+        generator = random.Random(0)
+        waiting_tasks: list[list[tuple[int, int]]] = [[] for _ in queues]
+        workers = [
+            (pool_queues, [0] * concurrency) for pool_queues, concurrency in pools
+        ]
+        latencies: dict[int, list[float]] = {priority: [] for priority in range(10)}
+        second = 0
+        while second < SIMULATED_SECONDS or any(waiting_tasks):
+            if second < SIMULATED_SECONDS and generator.random() < 0.7:
+                priority = generator.randrange(10)
+                queue = next(
+                    index
+                    for index, priorities in enumerate(queues)
+                    if priority in priorities
+                )
+                heapq.heappush(waiting_tasks[queue], (priority, second))
+            if second < SIMULATED_SECONDS / 10:
+                heapq.heappush(waiting_tasks[-1], (9, second))
+            for pool_queues, busy_until in workers:
+                for worker, worker_busy_until in enumerate(busy_until):
+                    if worker_busy_until > second:
+                        continue
+                    next_tasks = [
+                        (waiting_tasks[queue][0], queue)
+                        for queue in pool_queues
+                        if waiting_tasks[queue]
+                    ]
+                    if next_tasks:
+                        _, queue = min(next_tasks)
+                        priority, created_at = heapq.heappop(waiting_tasks[queue])
+                        latencies[priority].append(second - created_at)
+                        busy_until[worker] = second + 10
+            second += 1
+        return latencies
+
+    def test_priority_queues(self) -> None:
+        high_priority = settings.TASKS_HIGH_PRIORITY
+        low_priority = settings.TASKS_LOW_PRIORITY
+        # Like the celery service of docker-compose, with the default routing
+        shared_queue = self.process_tasks([range(10)], [([0], 8)])
+        # With TASKS_PRIORITY_QUEUES_ENABLED and a worker reserved for the tasks-high queue
+        priority_queues = self.process_tasks(
+            [
+                range(high_priority + 1),
+                range(high_priority + 1, low_priority),
+                range(low_priority, 10),
+            ],
+            [([0], 2), ([0, 1, 2], 6)],
+        )
+        self.report("Shared queue, 8 workers", shared_queue)
+        self.report(
+            "Priority queues, 2 reserved high priority and 6 shared workers",
+            priority_queues,
+        )
+
+        self.assertEqual(
+            sum(map(len, shared_queue.values())),
+            sum(map(len, priority_queues.values())),
+        )
+        shared_p99, priority_queues_p99 = (
+            {
+                priority: self.percentile(priority_latencies, 0.99)
+                for priority, priority_latencies in latencies.items()
+            }
+            for latencies in (shared_queue, priority_queues)
+        )
+        # The workers read priority 0 first across the queues, so the shared queue already
+        # serves the priorities in order
+        self.assertLess(shared_p99[0], shared_p99[9])
+        # The reserved workers don't lower the latency of the high priorities and delay the
+        # lowest ones, which is why the priority queues aren't enabled by default
+        for priority in range(high_priority + 1):
+            self.assertGreaterEqual(priority_queues_p99[priority], shared_p99[priority])
+        self.assertGreater(priority_queues_p99[9], shared_p99[9])
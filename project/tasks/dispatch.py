@@ -0,0 +1,162 @@
+from collections import defaultdict
+from datetime import timedelta
+from enum import StrEnum
+from typing import Iterable
+
+from celery import Signature, group
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from tasks.models import OutboxMessage, Task, TaskStatus
+
+from core.tasks import process_task, process_task_batch
+
+
+class DispatchMode(StrEnum):
+    SINGLE = "single"  # A message per task
+    BATCH = "batch"  # A message per batch of tasks having the same priority
+
+
+def outbox_messages(tasks: Iterable[Task], mode: DispatchMode) -> list[OutboxMessage]:
+    if mode == DispatchMode.SINGLE:
+        return [
+            OutboxMessage(task_ids=[task.task_id], priority=task.priority)
+            for task in tasks
+        ]
+
+    # Batches are built per priority level, so the broker priorities still apply, and the
+    # highest priorities, from 0, are published first
+    task_ids_by_priority = defaultdict(list)
+    for task in tasks:
+        task_ids_by_priority[task.priority].append(task.task_id)
+
+    batch_size = settings.TASKS_DISPATCH_BATCH_SIZE
+    return [
+        OutboxMessage(
+            task_ids=task_ids[index : index + batch_size],
+            priority=priority,
+            batch=True,
+        )
+        for priority, task_ids in sorted(task_ids_by_priority.items())
+        for index in range(0, len(task_ids), batch_size)
+    ]
+
+
+def priority_queue(priority: int) -> str:
+    """Returns the queue of the priority, so the high priorities can have reserved workers."""
+    if not settings.TASKS_PRIORITY_QUEUES_ENABLED:
+        return "tasks"
+    if priority <= settings.TASKS_HIGH_PRIORITY:
+        return "tasks-high"
+    if priority >= settings.TASKS_LOW_PRIORITY:
+        return "tasks-low"
+    return "tasks"
+
+
+def message_signature(message: OutboxMessage) -> Signature:
+    if message.batch:
+        signature = process_task_batch.s(message.task_ids)
+    else:
+        signature = process_task.s(message.task_ids[0])
+    return signature.set(
+        queue=priority_queue(message.priority), priority=message.priority
+    )
+
+
+def task_signatures(tasks: Iterable[Task], mode: DispatchMode) -> list[Signature]:
+    return [message_signature(message) for message in outbox_messages(tasks, mode)]
+
+
+def dispatch_tasks(tasks: Iterable[Task], mode: DispatchMode | None = None) -> None:
+    """
+    Writes the messages sending the tasks to processing in the outbox, within the current
+    transaction. They are published by the relay_outbox command once committed.
+    """
+    OutboxMessage.objects.bulk_create(
+        outbox_messages(tasks, mode or DispatchMode(settings.TASKS_DISPATCH_MODE))
+    )
+
+
+def relay_outbox(batch_size: int) -> int:
+    """
+    Publishes the oldest unsent outbox messages as a group and marks them as sent.
+
+    The messages are locked while they are published, so concurrent relays skip them. If
+    publishing fails, they stay unsent and are published again by the next run, which
+    process_task tolerates as it only starts pending tasks.
+    """
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(sent_at__isnull=True)
+            .order_by("outbox_message_id")[:batch_size]
+        )
+        if messages:
+            # A group publishes all the messages through a single producer
+            group(message_signature(message) for message in messages).apply_async()
+            sent_at = now()
+            OutboxMessage.objects.filter(
+                outbox_message_id__in=[
+                    message.outbox_message_id for message in messages
+                ]
+            ).update(sent_at=sent_at)
+            # The lease of the pending tasks starts once they can be received by a worker
+            Task.objects.filter(
+                task_id__in=[
+                    task_id for message in messages for task_id in message.task_ids
+                ],
+                status=TaskStatus.PENDING,
+            ).update(dispatched_at=sent_at)
+
+    return len(messages)
+
+
+def prune_outbox() -> int:
+    deleted, _ = OutboxMessage.objects.filter(
+        sent_at__lt=now() - timedelta(seconds=settings.TASKS_OUTBOX_RETENTION)
+    ).delete()
+    return deleted
+
+
+def reap_stuck_tasks(batch_size: int) -> dict[str, int]:
+    """
+    Sends the tasks which stayed pending or started for longer than TASKS_LEASE to processing
+    again, as their message was lost or their worker died.
+
+    A pending task is only reaped once its message was published by the outbox relay for
+    longer than the lease, so the tasks waiting in the outbox are left to it. The tasks are
+    found with the task_pending_dispatched_at_idx and task_unfinished_updated_at_idx indexes
+    and reaped in batches, started tasks are moved back to pending, so they can be started
+    again. Returns the number of reaped tasks per status.
+    """
+    cutoff = now() - timedelta(seconds=settings.TASKS_LEASE)
+    stuck_tasks = [
+        (TaskStatus.PENDING, Q(dispatched_at__lt=cutoff), "dispatched_at"),
+        (TaskStatus.STARTED, Q(updated_at__lt=cutoff), "updated_at"),
+    ]
+    reaped: dict[str, int] = {}
+    for status, stuck, order_by in stuck_tasks:
+        reaped[status] = 0
+        while True:
+            with transaction.atomic():
+                tasks = list(
+                    Task.objects.select_for_update(skip_locked=True)
+                    .filter(stuck, status=status)
+                    .order_by(order_by)
+                    .only("task_id", "priority")[:batch_size]
+                )
+                # Renewing the lease keeps the tasks out of the next sweeps until they're sent
+                Task.objects.filter(
+                    task_id__in=[task.task_id for task in tasks]
+                ).update(
+                    status=TaskStatus.PENDING, updated_at=now(), dispatched_at=None
+                )
+                dispatch_tasks(tasks)
+
+            reaped[status] += len(tasks)
+            if len(tasks) < batch_size:
+                break
+
+    return reaped
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Iterable
+
+import redis
+import redis.asyncio as async_redis
+from django.conf import settings
+
+from tasks.models import Task, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = (TaskStatus.SUCCESS, TaskStatus.ERROR)
+
+
+def task_channel(task_id: int) -> str:
+    return f"tasks:events:task:{task_id}"
+
+
+def task_schedule_channel(task_schedule_id: int) -> str:
+    return f"tasks:events:task-schedule:{task_schedule_id}"
+
+
+def task_event(task: Task) -> dict:
+    return {
+        "task_id": task.task_id,
+        "status": task.status,
+        "result": task.result,
+        "task_schedule": task.task_schedule_id,
+    }
+
+
+def format_event(event: dict) -> bytes:
+    return f"event: status\ndata: {json.dumps(event)}\n\n".encode()
+
+
+class TaskEventPublisher:
+    """
+    Publishes the status transitions of the tasks on Redis, for the event streams.
+
+    Every transition is published on the channel of the task and on the channel of its
+    schedule. Redis errors are logged, so publishing never fails a task.
+    """
+
+    def __init__(self) -> None:
+        self._redis: redis.Redis | None = None
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(settings.TASKS_EVENTS_REDIS_URL)
+        return self._redis
+
+    def publish(self, tasks: Iterable[Task]) -> None:
+        try:
+            with self.redis.pipeline(transaction=False) as pipeline:
+                for task in tasks:
+                    message = json.dumps(task_event(task))
+                    pipeline.publish(task_channel(task.task_id), message)
+                    if task.task_schedule_id is not None:
+                        pipeline.publish(
+                            task_schedule_channel(task.task_schedule_id), message
+                        )
+                pipeline.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Task events are unavailable: {e}")
+
+
+task_event_publisher = TaskEventPublisher()
+
+
+async def stream_task_events(
+    task_ids: list[int] | None = None, task_schedule_id: int | None = None
+) -> AsyncIterator[bytes]:
+    """
+    Streams the status transitions of the tasks, or of a schedule's tasks, as server-sent events.
+
+    The current status of the tasks is sent first and then every published transition. A stream
+    of tasks ends once all of them are finished, any stream ends after TASKS_EVENTS_TIMEOUT
+    seconds and a heartbeat comment is sent while nothing happens, to keep the connection open.
+    """
+    if task_ids:
+        channels = [task_channel(task_id) for task_id in task_ids]
+        tasks_queryset = Task.objects.filter(task_id__in=task_ids)
+    elif task_schedule_id is None:
+        raise ValueError("Either task_ids or task_schedule_id is required.")
+    else:
+        channels = [task_schedule_channel(task_schedule_id)]
+        tasks_queryset = Task.objects.filter(task_schedule_id=task_schedule_id).exclude(
+            status__in=FINISHED_STATUSES
+        )
+
+    client = async_redis.Redis.from_url(settings.TASKS_EVENTS_REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        # Subscribe before reading the current status, so no transition is missed in between
+        await pubsub.subscribe(*channels)
+
+        unfinished_task_ids = set()
+        async for task in tasks_queryset.only(
+            "task_id", "status", "result", "task_schedule"
+        ).order_by("task_id"):
+            yield format_event(task_event(task))
+            if task.status not in FINISHED_STATUSES:
+                unfinished_task_ids.add(task.task_id)
+        if task_ids and not unfinished_task_ids:
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.TASKS_EVENTS_TIMEOUT
+        while (remaining := deadline - loop.time()) > 0:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=min(remaining, settings.TASKS_EVENTS_HEARTBEAT),
+            )
+            if message is None:
+                yield b": heartbeat\n\n"
+                continue
+
+            event = json.loads(message["data"])
+            yield format_event(event)
+            if task_ids and event["status"] in FINISHED_STATUSES:
+                unfinished_task_ids.discard(event["task_id"])
+                if not unfinished_task_ids:
+                    return
+    except redis.RedisError as e:
+        logger.warning(f"Task events are unavailable: {e}")
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
@@ -0,0 +1,136 @@
+from datetime import datetime
+
+from django.db.models import QuerySet
+from django.utils.dateparse import parse_datetime
+from drf_yasg import openapi
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.request import Request
+
+from tasks.models import TaskStatus
+
+
+def get_int_param(request: Request, name: str) -> int | None:
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "Must be an integer."})
+
+
+def get_datetime_param(request: Request, name: str) -> datetime | None:
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    try:
+        parsed_value = parse_datetime(value)
+    except ValueError:
+        parsed_value = None
+    if parsed_value is None:
+        raise ValidationError({name: "Must be an ISO 8601 datetime."})
+    return parsed_value
+
+
+class TaskFilterBackend(BaseFilterBackend):
+    """
+    Filters the tasks by status, priority, schedule and creation time.
+
+    Every filter combines with the (created_at, task_id) ordering of the cursor pagination
+    using an index: unfinished statuses use task_unfinished_status_idx, a schedule uses
+    task_schedule_created_at_idx and the rest are read in task_created_at_idx order.
+    """
+
+    parameters = [
+        openapi.Parameter(
+            "status",
+            openapi.IN_QUERY,
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Items(type=openapi.TYPE_STRING, enum=list(TaskStatus)),
+            collection_format="multi",
+            description="Only tasks with one of the statuses",
+        ),
+        openapi.Parameter(
+            "priority",
+            openapi.IN_QUERY,
+            type=openapi.TYPE_INTEGER,
+            description="Only tasks with the priority",
+        ),
+        openapi.Parameter(
+            "task_schedule",
+            openapi.IN_QUERY,
+            type=openapi.TYPE_INTEGER,
+            description="Only tasks created by the schedule",
+        ),
+        openapi.Parameter(
+            "created_after",
+            openapi.IN_QUERY,
+            type=openapi.TYPE_STRING,
+            format=openapi.FORMAT_DATETIME,
+            description="Only tasks created at or after the datetime",
+        ),
+        openapi.Parameter(
+            "created_before",
+            openapi.IN_QUERY,
+            type=openapi.TYPE_STRING,
+            format=openapi.FORMAT_DATETIME,
+            description="Only tasks created before the datetime",
+        ),
+    ]
+
+    def filter_queryset(
+        self, request: Request, queryset: QuerySet, view: object
+    ) -> QuerySet:
+        if statuses := request.query_params.getlist("status"):
+            invalid_statuses = set(statuses) - set(TaskStatus)
+            if invalid_statuses:
+                raise ValidationError(
+                    {"status": f"Status must be one of: {', '.join(TaskStatus)}."}
+                )
+            queryset = queryset.filter(status__in=statuses)
+        if (priority := get_int_param(request, "priority")) is not None:
+            queryset = queryset.filter(priority=priority)
+        if (task_schedule := get_int_param(request, "task_schedule")) is not None:
+            queryset = queryset.filter(task_schedule=task_schedule)
+        if (created_after := get_datetime_param(request, "created_after")) is not None:
+            queryset = queryset.filter(created_at__gte=created_after)
+        if (
+            created_before := get_datetime_param(request, "created_before")
+        ) is not None:
+            queryset = queryset.filter(created_at__lt=created_before)
+        return queryset
+
+
+class TaskScheduleFilterBackend(BaseFilterBackend):
+    """Filters the task schedules by priority and whether they can still create tasks."""
+
+    parameters = [
+        openapi.Parameter(
+            "priority",
+            openapi.IN_QUERY,
+            type=openapi.TYPE_INTEGER,
+            description="Only schedules with the priority",
+        ),
+        openapi.Parameter(
+            "active",
+            openapi.IN_QUERY,
+            type=openapi.TYPE_BOOLEAN,
+            description="Only schedules which can still create tasks, or only the exhausted ones",
+        ),
+    ]
+
+    def filter_queryset(
+        self, request: Request, queryset: QuerySet, view: object
+    ) -> QuerySet:
+        if (priority := get_int_param(request, "priority")) is not None:
+            queryset = queryset.filter(priority=priority)
+        active = request.query_params.get("active")
+        if active is not None:
+            if active.lower() not in ("true", "false"):
+                raise ValidationError({"active": "Must be true or false."})
+            if active.lower() == "true":
+                queryset = queryset.filter(schedule_x_times__gt=0)
+            else:
+                queryset = queryset.filter(schedule_x_times=0)
+        return queryset
@@ -1,9 +1,9 @@
 from abc import ABC, abstractmethod
-from datetime import timedelta
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
 
 from django.utils.timezone import now
-from tasks.models import Task, TaskSchedule
+from tasks.models import TaskSchedule
 
 
 class TaskCreationHandler(ABC):
@@ -11,19 +11,30 @@ class TaskCreationHandler(ABC):
         self.next_handler = next_handler
 
     @abstractmethod
-    def handle(self, schedule: TaskSchedule, last_task: Task | None) -> bool:
+    def handle(
+        self,
+        schedule: TaskSchedule,
+        last_task_created_at: datetime | None,
+        current_time: datetime | None = None,
+    ) -> bool:
         pass
 
 
 class DaysCheckHandler(TaskCreationHandler):
-    def handle(self, schedule: TaskSchedule, last_task: Task | None) -> bool:
+    def handle(
+        self,
+        schedule: TaskSchedule,
+        last_task_created_at: datetime | None,
+        current_time: datetime | None = None,
+    ) -> bool:
         if (
             schedule.every_x_days is None
-            or last_task is None
-            or last_task.created_at <= now() - timedelta(days=schedule.every_x_days)
+            or last_task_created_at is None
+            or last_task_created_at
+            <= (current_time or now()) - timedelta(days=schedule.every_x_days)
         ):
             return (
-                self.next_handler.handle(schedule, last_task)
+                self.next_handler.handle(schedule, last_task_created_at, current_time)
                 if self.next_handler
                 else True
             )
@@ -31,14 +42,20 @@ class DaysCheckHandler(TaskCreationHandler):
 
 
 class HoursCheckHandler(TaskCreationHandler):
-    def handle(self, schedule: TaskSchedule, last_task: Task | None) -> bool:
+    def handle(
+        self,
+        schedule: TaskSchedule,
+        last_task_created_at: datetime | None,
+        current_time: datetime | None = None,
+    ) -> bool:
         if (
             schedule.every_x_hours is None
-            or last_task is None
-            or last_task.created_at <= now() - timedelta(hours=schedule.every_x_hours)
+            or last_task_created_at is None
+            or last_task_created_at
+            <= (current_time or now()) - timedelta(hours=schedule.every_x_hours)
         ):
             return (
-                self.next_handler.handle(schedule, last_task)
+                self.next_handler.handle(schedule, last_task_created_at, current_time)
                 if self.next_handler
                 else True
             )
@@ -46,13 +63,15 @@ class HoursCheckHandler(TaskCreationHandler):
 
 
 class TaskCountCheckHandler(TaskCreationHandler):
-    def handle(self, schedule: TaskSchedule, last_task: Task | None) -> bool:
-        if (
-            Task.objects.filter(task_schedule=schedule).count()
-            <= schedule.schedule_x_times
-        ):
+    def handle(
+        self,
+        schedule: TaskSchedule,
+        last_task_created_at: datetime | None,
+        current_time: datetime | None = None,
+    ) -> bool:
+        if schedule.tasks_created <= schedule.schedule_x_times:
             return (
-                self.next_handler.handle(schedule, last_task)
+                self.next_handler.handle(schedule, last_task_created_at, current_time)
                 if self.next_handler
                 else True
             )
@@ -60,3 +79,28 @@ class TaskCountCheckHandler(TaskCreationHandler):
 
 
 task_creation_check_chain = TaskCountCheckHandler(HoursCheckHandler(DaysCheckHandler()))
+
+
+def evaluate_due(
+    schedules: Sequence[TaskSchedule],
+    last_created_at: Sequence[datetime | None],
+    counts: Sequence[int],
+    current_time: datetime,
+) -> list[bool]:
+    """
+    Evaluates a whole batch of schedules in a single pass against the same time snapshot.
+
+    The outcome is the same as running task_creation_check_chain for every schedule, which
+    remains the extensible interface for evaluating a single schedule.
+    """
+    return [
+        tasks_count <= schedule.schedule_x_times
+        and (
+            last_task_created_at is None
+            or (schedule.every_x_days is None and schedule.every_x_hours is None)
+            or last_task_created_at <= current_time - schedule.interval
+        )
+        for schedule, last_task_created_at, tasks_count in zip(
+            schedules, last_created_at, counts, strict=True
+        )
+    ]
@@ -1,62 +1,78 @@
-from celery import group
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.db.models import F
-from django.db.transaction import on_commit
-from django.utils.timezone import now
+import time
 
-from tasks.handlers import task_creation_check_chain
-from tasks.models import Task, TaskSchedule
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
-from core.tasks import process_task
+from tasks.dispatch import DispatchMode
+from tasks.scheduling import process_batch
 
 
 class Command(BaseCommand):
     help = "Process task schedules and create tasks if conditions are met."
 
-    def handle(self, *args, **kwargs):
-        # Make sure that the schedules that are currently processed don't get deleted in the meantime
-        task_schedules = (
-            TaskSchedule.objects.select_for_update(skip_locked=True)
-            .filter(schedule_x_times__gt=0)
-            .order_by("checked_scheduling_at")[:100]
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.TASK_SCHEDULES_BATCH_SIZE,
+            help="Number of schedules processed in a single transaction.",
         )
-        new_tasks = []
-
-        with transaction.atomic():
-            for schedule in task_schedules:
-                # Get the last created task for the schedule
-                last_task = (
-                    Task.objects.filter(task_schedule=schedule)
-                    .order_by("-created_at")
-                    .first()
-                )
-
-                if task_creation_check_chain.handle(schedule, last_task) is False:
-                    continue
-
-                new_task = Task.objects.create(
-                    operation=schedule.operation,
-                    priority=schedule.priority,
-                    task_schedule=schedule,
-                )
-                new_tasks.append(new_task)
-
-                # Update the schedule by decreasing schedule_x_times and
-                # updating checked_scheduling_data to ensure that other schedules will be fetched next
-                schedule.schedule_x_times = F("schedule_x_times") - 1
-                schedule.checked_scheduling_at = now()
-                schedule.save()
-
-            # send group to broker after db commit
-            task_group = group(
-                process_task.s(task.task_id).set(priority=task.priority)
-                for task in new_tasks
+        parser.add_argument(
+            "--time-budget",
+            type=float,
+            default=settings.TASK_SCHEDULES_TIME_BUDGET,
+            help="Seconds after which no new batch is started. Use 0 for a single batch.",
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=1,
+            help="Number of shards the schedules are split into by task_schedule_id.",
+        )
+        parser.add_argument(
+            "--shard",
+            type=int,
+            default=0,
+            help="Shard processed by this run, between 0 and shards - 1.",
+        )
+        parser.add_argument(
+            "--dispatch",
+            choices=list(DispatchMode),
+            default=settings.TASKS_DISPATCH_MODE,
+            help="Send a message per created task or per batch of tasks with the same priority.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        time_budget = options["time_budget"]
+        shards = options["shards"]
+        shard = options["shard"]
+        dispatch_mode = DispatchMode(options["dispatch"])
+        if not 0 <= shard < shards:
+            raise CommandError(f"Shard must be between 0 and {shards - 1}.")
+
+        started_at = time.monotonic()
+        batches_count = schedules_count = tasks_count = 0
+
+        # Drain the due schedules in short transactions until none is left or the time budget is exhausted
+        while True:
+            batch_started_at = time.monotonic()
+            processed, created = process_batch(batch_size, shard, shards, dispatch_mode)
+            batch_duration = time.monotonic() - batch_started_at
+
+            batches_count += 1
+            schedules_count += processed
+            tasks_count += created
+            self.stdout.write(
+                f"Batch {batches_count}: processed {processed} schedules and created {created} tasks "
+                f"in {batch_duration:.3f}s ({processed / batch_duration:.1f} schedules/s)."
             )
-            on_commit(task_group.apply_async)
+
+            if processed < batch_size or time.monotonic() - started_at >= time_budget:
+                break
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Processed {len(task_schedules)} schedules and created {len(new_tasks)} tasks."
+                f"Processed {schedules_count} schedules and created {tasks_count} tasks."
             )
         )
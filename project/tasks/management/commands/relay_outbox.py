@@ -0,0 +1,74 @@
+import logging
+import time
+
+import kombu.exceptions
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import InterfaceError, OperationalError, close_old_connections
+
+from tasks.dispatch import prune_outbox, relay_outbox
+
+logger = logging.getLogger(__name__)
+
+# Errors of the broker or the database after which the relay retries once they're reachable
+RELAY_ERRORS = (
+    kombu.exceptions.OperationalError,
+    redis.RedisError,
+    OperationalError,
+    InterfaceError,
+)
+
+
+class Command(BaseCommand):
+    help = "Publish the outbox messages to the broker."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.TASKS_OUTBOX_BATCH_SIZE,
+            help="Number of messages published in a single transaction.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.TASKS_OUTBOX_POLL_INTERVAL,
+            help="Seconds to wait for new messages once the outbox is drained.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the outbox once and exit instead of polling it.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        messages_count = 0
+        backoff = options["poll_interval"]
+
+        while True:
+            try:
+                relayed = relay_outbox(batch_size)
+            except RELAY_ERRORS as e:
+                # The messages are kept in the outbox until they're published
+                logger.warning(f"Outbox relay failed, retrying in {backoff}s: {e}")
+                close_old_connections()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, settings.TASKS_OUTBOX_MAX_BACKOFF)
+                continue
+
+            backoff = options["poll_interval"]
+            messages_count += relayed
+            if relayed == batch_size:
+                continue
+
+            # The outbox is drained, so the sent messages are cleaned up before waiting
+            prune_outbox()
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Published {messages_count} outbox messages.")
+        )
@@ -0,0 +1,71 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import InterfaceError, OperationalError
+
+from tasks.dispatch import DispatchMode
+from tasks.scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Create the tasks of the task schedules at their due time."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horizon",
+            type=float,
+            default=settings.TASK_SCHEDULER_HORIZON,
+            help="Seconds ahead for which the upcoming runs are kept in memory.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.TASK_SCHEDULES_BATCH_SIZE,
+            help="Number of due schedules processed in a single transaction.",
+        )
+        parser.add_argument(
+            "--dispatch",
+            choices=list(DispatchMode),
+            default=settings.TASKS_DISPATCH_MODE,
+            help="Send a message per created task or per batch of tasks with the same priority.",
+        )
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler(
+            options["horizon"],
+            options["batch_size"],
+            DispatchMode(options["dispatch"]),
+        )
+        connected = False
+        backoff = 1.0
+
+        try:
+            while True:
+                try:
+                    if not connected:
+                        loaded = scheduler.connect()
+                        connected = True
+                        backoff = 1.0
+                        self.stdout.write(f"Loaded {loaded} upcoming runs.")
+
+                    processed, created = scheduler.run_pending()
+                    if processed:
+                        self.stdout.write(
+                            f"Processed {processed} schedules and created {created} tasks."
+                        )
+                    scheduler.wait_for_changes()
+                except (OperationalError, InterfaceError) as e:
+                    # The due schedules are fired once reconnected, as they are loaded again
+                    logger.warning(
+                        f"Scheduler lost the database, reconnecting in {backoff}s: {e}"
+                    )
+                    connected = False
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, settings.TASK_SCHEDULER_MAX_BACKOFF)
+        finally:
+            if connected:
+                scheduler.unlisten()
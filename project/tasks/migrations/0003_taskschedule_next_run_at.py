@@ -0,0 +1,27 @@
+# Generated by Django 5.0.7 on 2026-10-16 23:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0002_alter_taskschedule_schedule_x_times"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskschedule",
+            name="next_run_at",
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="taskschedule",
+            index=models.Index(
+                condition=models.Q(("schedule_x_times__gt", 0)),
+                fields=["next_run_at"],
+                name="taskschedule_next_run_at_idx",
+            ),
+        ),
+    ]
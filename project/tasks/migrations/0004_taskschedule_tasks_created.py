@@ -0,0 +1,45 @@
+# Generated by Django 5.0.7 on 2026-10-16 23:29
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_task_counters(apps, schema_editor):
+    Task = apps.get_model("tasks", "Task")
+    TaskSchedule = apps.get_model("tasks", "TaskSchedule")
+
+    schedule_tasks = (
+        Task.objects.filter(task_schedule=OuterRef("pk"))
+        .order_by()
+        .values("task_schedule")
+    )
+    TaskSchedule.objects.update(
+        tasks_created=Coalesce(
+            Subquery(schedule_tasks.annotate(count=Count("pk")).values("count")), 0
+        ),
+        last_task_created_at=Subquery(
+            schedule_tasks.annotate(last=Max("created_at")).values("last")
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0003_taskschedule_next_run_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskschedule",
+            name="last_task_created_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="taskschedule",
+            name="tasks_created",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_task_counters, migrations.RunPython.noop),
+    ]
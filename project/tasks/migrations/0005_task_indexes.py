@@ -0,0 +1,50 @@
+# Generated by Django 5.0.7 on 2026-10-16 23:30
+
+import django.db.models.deletion
+import tasks.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0004_taskschedule_tasks_created"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["task_schedule", "-created_at"],
+                name="task_schedule_created_at_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(
+                    (
+                        "status__in",
+                        [
+                            tasks.models.TaskStatus["PENDING"],
+                            tasks.models.TaskStatus["STARTED"],
+                        ],
+                    )
+                ),
+                fields=["status", "created_at"],
+                name="task_unfinished_status_idx",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="task",
+            name="task_schedule",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="tasks",
+                to="tasks.taskschedule",
+            ),
+        ),
+    ]
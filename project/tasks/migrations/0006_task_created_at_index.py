@@ -0,0 +1,19 @@
+# Generated by Django 5.0.7 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0005_task_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["-created_at", "-task_id"], name="task_created_at_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.7 on 2026-10-16 23:53
+
+import tasks.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0007_outboxmessage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(
+                    (
+                        "status__in",
+                        [
+                            tasks.models.TaskStatus["PENDING"],
+                            tasks.models.TaskStatus["STARTED"],
+                        ],
+                    )
+                ),
+                fields=["status", "updated_at"],
+                name="task_unfinished_updated_at_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.7 on 2026-10-17 00:37
+
+import tasks.models
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_dispatched_at(apps, schema_editor):
+    Task = apps.get_model("tasks", "Task")
+    OutboxMessage = apps.get_model("tasks", "OutboxMessage")
+
+    # The pending tasks still in the outbox are dispatched by the relay
+    unsent_task_ids = {
+        task_id
+        for task_ids in OutboxMessage.objects.filter(sent_at__isnull=True).values_list(
+            "task_ids", flat=True
+        )
+        for task_id in task_ids
+    }
+    Task.objects.filter(status="PENDING").exclude(task_id__in=unsent_task_ids).update(
+        dispatched_at=F("updated_at")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0008_task_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="dispatched_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_dispatched_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(
+                    ("dispatched_at__isnull", False),
+                    ("status", tasks.models.TaskStatus["PENDING"]),
+                ),
+                fields=["dispatched_at"],
+                name="task_pending_dispatched_at_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-17 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0009_task_dispatched_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="taskschedule",
+            index=models.Index(
+                condition=models.Q(("schedule_x_times__gt", 0)),
+                fields=["priority", "next_run_at"],
+                name="taskschedule_priority_idx",
+            ),
+        ),
+    ]
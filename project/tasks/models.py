@@ -1,16 +1,36 @@
-import re
+from datetime import timedelta
 from enum import StrEnum
 
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connection, models
+from django.db.models import Prefetch, Q
+from django.utils.timezone import now
+
+from tasks.operations import parse_operation
 
 
 def validate_addition_operation(value: str) -> None:
-    if not re.fullmatch(r"\d+(\.\d+)?\+\d+(\.\d+)?", value):
+    if parse_operation(value) is None:
         raise ValidationError(f'"{value}" is not a valid addition operation.')
 
 
+class TaskScheduleQuerySet(models.QuerySet):
+    def with_latest_tasks(self) -> "TaskScheduleQuerySet":
+        """Prefetches a bounded number of the latest tasks of every schedule in latest_tasks."""
+        return self.prefetch_related(
+            Prefetch(
+                "tasks",
+                queryset=Task.objects.order_by("-created_at", "-task_id")[
+                    : settings.TASK_SCHEDULE_LATEST_TASKS_COUNT
+                ],
+                to_attr="latest_tasks",
+            )
+        )
+
+
 class TaskSchedule(models.Model):
     task_schedule_id = models.AutoField(primary_key=True)
     operation = models.TextField(validators=[validate_addition_operation])
@@ -29,10 +49,38 @@ class TaskSchedule(models.Model):
         db_index=True,
     )  # Minimum value is 1
     checked_scheduling_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    next_run_at = models.DateTimeField(
+        default=now, null=True
+    )  # Null when the schedule won't create tasks anymore
+    tasks_created = models.PositiveIntegerField(default=0)
+    last_task_created_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TaskScheduleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_run_at"],
+                condition=Q(schedule_x_times__gt=0),
+                name="taskschedule_next_run_at_idx",
+            ),
+            models.Index(
+                fields=["priority", "next_run_at"],
+                condition=Q(schedule_x_times__gt=0),
+                name="taskschedule_priority_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"TaskSchedule {self.task_schedule_id} - {self.operation}"
 
+    @property
+    def interval(self) -> timedelta:
+        return max(
+            timedelta(days=self.every_x_days or 0),
+            timedelta(hours=self.every_x_hours or 0),
+        )
+
 
 class TaskStatus(StrEnum):
     PENDING = "PENDING"
@@ -41,6 +89,95 @@ class TaskStatus(StrEnum):
     ERROR = "ERROR"
 
 
+class TaskQuerySet(models.QuerySet):
+    def start(self, task_ids: list[int]) -> list["Task"]:
+        """
+        Moves the pending tasks to STARTED with a single UPDATE ... RETURNING statement.
+
+        Only the tasks matching the filters of the queryset are started. Tasks which were
+        deleted or are already processed are left out, so duplicate deliveries and concurrent
+        deletions are resolved by the database.
+        """
+        quote_name = connection.ops.quote_name
+        pending_tasks_sql, pending_tasks_params = (
+            self.filter(task_id__in=task_ids, status=TaskStatus.PENDING)
+            .order_by()
+            .values("task_id")
+            .query.sql_with_params()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {quote_name(self.model._meta.db_table)} "
+                f"SET {quote_name('status')} = %s, {quote_name('updated_at')} = %s "
+                f"WHERE {quote_name('task_id')} IN ({pending_tasks_sql}) AND {quote_name('status')} = %s "
+                f"RETURNING {quote_name('task_id')}, {quote_name('operation')}, {quote_name('priority')}, "
+                f"{quote_name('task_schedule_id')}",
+                [
+                    TaskStatus.STARTED,
+                    now(),
+                    *pending_tasks_params,
+                    TaskStatus.PENDING,
+                ],
+            )
+            return [
+                self.model(
+                    task_id=task_id,
+                    operation=operation,
+                    priority=priority,
+                    task_schedule_id=task_schedule_id,
+                    status=TaskStatus.STARTED,
+                )
+                for task_id, operation, priority, task_schedule_id in cursor.fetchall()
+            ]
+
+    def finish(self, tasks: list["Task"]) -> list["Task"]:
+        """
+        Saves the status and result of the started tasks with a single UPDATE ... RETURNING
+        statement and returns the tasks which were written.
+
+        Tasks which aren't started anymore, e.g. because they were sent to processing again
+        by the reaper, or don't match the filters of the queryset are left out.
+        """
+        if not tasks:
+            return []
+
+        quote_name = connection.ops.quote_name
+        table = quote_name(self.model._meta.db_table)
+        started_tasks_sql, started_tasks_params = (
+            self.filter(
+                task_id__in=[task.task_id for task in tasks],
+                status=TaskStatus.STARTED,
+            )
+            .order_by()
+            .values("task_id")
+            .query.sql_with_params()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} "
+                f"SET {quote_name('status')} = finished.status, {quote_name('result')} = finished.result, "
+                f"{quote_name('updated_at')} = %s "
+                f"FROM (VALUES {', '.join(['(%s, %s, %s::double precision)'] * len(tasks))}) "
+                f"AS finished (task_id, status, result) "
+                f"WHERE {table}.{quote_name('task_id')} = finished.task_id "
+                f"AND {table}.{quote_name('task_id')} IN ({started_tasks_sql}) "
+                f"AND {table}.{quote_name('status')} = %s "
+                f"RETURNING {table}.{quote_name('task_id')}",
+                [
+                    now(),
+                    *(
+                        value
+                        for task in tasks
+                        for value in (task.task_id, task.status, task.result)
+                    ),
+                    *started_tasks_params,
+                    TaskStatus.STARTED,
+                ],
+            )
+            finished_task_ids = {task_id for (task_id,) in cursor.fetchall()}
+        return [task for task in tasks if task.task_id in finished_task_ids]
+
+
 class Task(models.Model):
     task_id = models.AutoField(primary_key=True)
     operation = models.TextField(validators=[validate_addition_operation])
@@ -59,8 +196,79 @@ class Task(models.Model):
         null=True,
         blank=True,
         related_name="tasks",
+        db_index=False,  # Covered by the task_schedule_created_at_idx index
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Not set by update() and bulk_update(), so status changes have to set it explicitly
+    updated_at = models.DateTimeField(auto_now=True)
+    # When the message sending the pending task to processing was published by the outbox relay
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["task_schedule", "-created_at"],
+                name="task_schedule_created_at_idx",
+            ),
+            models.Index(
+                fields=["-created_at", "-task_id"],
+                name="task_created_at_idx",
+            ),
+            models.Index(
+                fields=["status", "created_at"],
+                condition=Q(status__in=[TaskStatus.PENDING, TaskStatus.STARTED]),
+                name="task_unfinished_status_idx",
+            ),
+            models.Index(
+                fields=["status", "updated_at"],
+                condition=Q(status__in=[TaskStatus.PENDING, TaskStatus.STARTED]),
+                name="task_unfinished_updated_at_idx",
+            ),
+            models.Index(
+                fields=["dispatched_at"],
+                condition=Q(status=TaskStatus.PENDING, dispatched_at__isnull=False),
+                name="task_pending_dispatched_at_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Task {self.task_id} - {self.operation}"
+
+
+class OutboxMessage(models.Model):
+    """
+    Message sending tasks to processing, written in the transaction which creates the tasks.
+
+    The relay_outbox command publishes the unsent messages to the broker and marks them as
+    sent, so the tasks are sent to processing even if the process dies right after the commit.
+    """
+
+    outbox_message_id = models.BigAutoField(primary_key=True)
+    task_ids = ArrayField(models.IntegerField())
+    priority = models.PositiveIntegerField(
+        validators=[MinValueValidator(0), MaxValueValidator(9)]
+    )
+    batch = models.BooleanField(
+        default=False
+    )  # Processed by process_task_batch instead of process_task
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["outbox_message_id"],
+                condition=Q(sent_at__isnull=True),
+                name="outbox_unsent_idx",
+            ),
+            models.Index(
+                fields=["sent_at"],
+                condition=Q(sent_at__isnull=False),
+                name="outbox_sent_at_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"OutboxMessage {self.outbox_message_id} - tasks {self.task_ids}"
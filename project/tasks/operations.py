@@ -0,0 +1,23 @@
+import re
+from functools import lru_cache
+
+OPERATIONS_CACHE_SIZE = 4096
+
+# Addition of two or more non-negative decimal numbers, e.g. "1+2.5+3"
+ADDITION_OPERATION_PATTERN = re.compile(r"\d+(?:\.\d+)?(?:\+\d+(?:\.\d+)?)+")
+
+
+@lru_cache(maxsize=OPERATIONS_CACHE_SIZE)
+def parse_operation(operation: str) -> tuple[float, ...] | None:
+    """Returns the terms of an addition operation or None if the operation is not valid."""
+    if not ADDITION_OPERATION_PATTERN.fullmatch(operation):
+        return None
+    return tuple(float(term) for term in operation.split("+"))
+
+
+@lru_cache(maxsize=OPERATIONS_CACHE_SIZE)
+def evaluate_operation(operation: str) -> float:
+    terms = parse_operation(operation)
+    if terms is None:
+        raise ValueError(f'"{operation}" is not a valid addition operation.')
+    return sum(terms)
@@ -0,0 +1,20 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class TaskCursorPagination(CursorPagination):
+    """Keyset pagination over the tasks, latest first."""
+
+    ordering = ("-created_at", "-task_id")
+    page_size = settings.TASKS_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class TaskScheduleCursorPagination(CursorPagination):
+    """Keyset pagination over the task schedules, latest first."""
+
+    ordering = ("-task_schedule_id",)
+    page_size = settings.TASKS_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 1000
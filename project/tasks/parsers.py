@@ -0,0 +1,22 @@
+from typing import IO, Any, Iterator
+
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Newline delimited JSON parser.
+
+    The body isn't read upfront, the parsed data is an iterator over the lines of the
+    request stream, so the view can process arbitrary large payloads with constant memory.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(
+        self,
+        stream: IO[bytes],
+        media_type: str | None = None,
+        parser_context: dict[str, Any] | None = None,
+    ) -> Iterator[bytes]:
+        return iter(stream.readline, b"")
@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import cast
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Results of the operations which were already computed.
+
+    An in-process LRU tier sits in front of a Redis tier shared by all the workers.
+    Both tiers expire the entries after TASKS_RESULT_CACHE_TTL seconds. Redis errors
+    are logged and handled as misses, so the cache never fails a task.
+    """
+
+    key_prefix = "tasks:result:"
+
+    def __init__(self) -> None:
+        self.local: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.counters: Counter[str] = Counter()
+        self.lock = threading.Lock()
+        self._redis: redis.Redis | None = None
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+        return self._redis
+
+    def get_many(self, operations: list[str]) -> dict[str, float]:
+        results = {}
+        now = time.monotonic()
+        with self.lock:
+            for operation in operations:
+                entry = self.local.get(operation)
+                if entry is None:
+                    continue
+                expires_at, result = entry
+                if expires_at <= now:
+                    del self.local[operation]
+                    continue
+                self.local.move_to_end(operation)
+                results[operation] = result
+        self.counters["local_hits"] += len(results)
+
+        missing_operations = [
+            operation
+            for operation in dict.fromkeys(operations)
+            if operation not in results
+        ]
+        if missing_operations:
+            try:
+                values = cast(
+                    list[bytes | None],
+                    self.redis.mget(
+                        [
+                            self.key_prefix + operation
+                            for operation in missing_operations
+                        ]
+                    ),
+                )
+            except redis.RedisError as e:
+                logger.warning(f"Result cache is unavailable: {e}")
+                values = [None] * len(missing_operations)
+
+            redis_results = {
+                operation: float(value)
+                for operation, value in zip(missing_operations, values)
+                if value is not None
+            }
+            self.set_local(redis_results)
+            results.update(redis_results)
+            self.counters["redis_hits"] += len(redis_results)
+            self.counters["misses"] += len(missing_operations) - len(redis_results)
+
+        return results
+
+    def set_many(self, results: dict[str, float]) -> None:
+        self.set_local(results)
+        try:
+            with self.redis.pipeline(transaction=False) as pipeline:
+                for operation, result in results.items():
+                    pipeline.set(
+                        self.key_prefix + operation,
+                        result,
+                        ex=settings.TASKS_RESULT_CACHE_TTL,
+                    )
+                pipeline.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Result cache is unavailable: {e}")
+
+    def set_local(self, results: dict[str, float]) -> None:
+        expires_at = time.monotonic() + settings.TASKS_RESULT_CACHE_TTL
+        with self.lock:
+            for operation, result in results.items():
+                self.local[operation] = (expires_at, result)
+                self.local.move_to_end(operation)
+            while len(self.local) > settings.TASKS_RESULT_CACHE_LOCAL_SIZE:
+                self.local.popitem(last=False)
+
+    def clear_local(self) -> None:
+        with self.lock:
+            self.local.clear()
+        self.counters.clear()
+
+
+result_cache = ResultCache()
@@ -0,0 +1,184 @@
+import select
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, cast
+
+from django.db import connection
+from django.utils.timezone import now
+
+from tasks.dispatch import DispatchMode
+from tasks.models import TaskSchedule
+from tasks.scheduling import process_schedules, weighted_run_at
+from tasks.timing_wheel import TimingWheel
+
+TASK_SCHEDULES_CHANNEL = "task_schedules"
+
+
+def notify_task_schedule_changed(task_schedule_id: int) -> None:
+    # The notification is delivered once the current transaction commits
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_notify(%s, %s)", [TASK_SCHEDULES_CHANNEL, str(task_schedule_id)]
+        )
+
+
+class Scheduler:
+    """
+    Fires the task schedules at their due time, from a timing wheel of their upcoming runs.
+
+    Only the runs due within the horizon are kept in memory. They are loaded from the database
+    when the scheduler starts and then every half horizon. Created, updated and deleted schedules
+    are reloaded when their notification is received on the task_schedules channel, so the
+    database is only queried when something changes or is due.
+    """
+
+    def __init__(
+        self,
+        horizon: float,
+        batch_size: int,
+        dispatch_mode: DispatchMode | None = None,
+    ) -> None:
+        self.horizon = timedelta(seconds=horizon)
+        self.batch_size = batch_size
+        self.dispatch_mode = dispatch_mode
+        self.loaded_until = now()
+        self.wheel = TimingWheel(self.loaded_until.timestamp())
+        # Weighted fair run time of every run in the wheel, by which the due runs are fired
+        self.weighted_runs: dict[int, datetime] = {}
+
+    @property
+    def reload_at(self) -> datetime:
+        return self.loaded_until - self.horizon / 2
+
+    def schedule(
+        self, task_schedule_id: int, next_run_at: datetime | None, priority: int | None
+    ) -> None:
+        if next_run_at is None or next_run_at > self.loaded_until:
+            # Not due within the horizon, it's loaded again once it is
+            self.wheel.cancel(task_schedule_id)
+            self.weighted_runs.pop(task_schedule_id, None)
+        else:
+            self.wheel.add(task_schedule_id, next_run_at.timestamp())
+            self.weighted_runs[task_schedule_id] = weighted_run_at(
+                next_run_at, priority
+            )
+
+    def load(self) -> int:
+        """Loads the runs due within the horizon, in chunks, using the partial index on next_run_at."""
+        self.loaded_until = now() + self.horizon
+        upcoming_runs = (
+            TaskSchedule.objects.filter(
+                schedule_x_times__gt=0, next_run_at__lte=self.loaded_until
+            )
+            .values_list("task_schedule_id", "next_run_at", "priority")
+            .iterator(chunk_size=self.batch_size)
+        )
+        loaded = 0
+        for task_schedule_id, next_run_at, priority in upcoming_runs:
+            self.schedule(task_schedule_id, next_run_at, priority)
+            loaded += 1
+        return loaded
+
+    def refresh(self, task_schedule_ids: Iterable[int]) -> None:
+        task_schedule_ids = set(task_schedule_ids)
+        next_runs = {
+            task_schedule_id: (next_run_at, priority)
+            for task_schedule_id, next_run_at, priority in TaskSchedule.objects.filter(
+                task_schedule_id__in=task_schedule_ids, schedule_x_times__gt=0
+            ).values_list("task_schedule_id", "next_run_at", "priority")
+        }
+        for task_schedule_id in task_schedule_ids:
+            self.schedule(
+                task_schedule_id, *next_runs.get(task_schedule_id, (None, None))
+            )
+
+    def pop_due(self, current_time: datetime) -> list[int]:
+        """
+        Removes and returns the due runs by the weighted fair order of claim_schedules, so
+        the higher priorities are fired first when a backlog is due at once.
+        """
+        # Only task schedule ids are added to the wheel
+        due_schedule_ids = cast(list[int], self.wheel.advance(current_time.timestamp()))
+        return [
+            task_schedule_id
+            for _, task_schedule_id in sorted(
+                (self.weighted_runs.pop(task_schedule_id), task_schedule_id)
+                for task_schedule_id in due_schedule_ids
+            )
+        ]
+
+    def fire(self, task_schedule_ids: list[int]) -> tuple[int, int]:
+        """
+        Creates the tasks of a batch of due schedules and plans their next runs.
+
+        The schedules are checked again while they are locked, so a schedule which was
+        processed by another scheduler in the meantime doesn't create a task twice.
+        """
+        processed, created = process_schedules(task_schedule_ids, self.dispatch_mode)
+        self.refresh(task_schedule_ids)
+        return processed, created
+
+    def timeout(self) -> float:
+        wake_at = self.reload_at
+        next_due_at = self.wheel.next_due_at()
+        if next_due_at is not None:
+            wake_at = min(wake_at, datetime.fromtimestamp(next_due_at, tz=timezone.utc))
+        return max((wake_at - now()).total_seconds(), 0)
+
+    def connect(self) -> int:
+        """
+        Reconnects to the database, listens to the notifications and loads the upcoming runs
+        from scratch, as the notifications sent while disconnected are lost.
+        """
+        connection.close()
+        self.wheel = TimingWheel(now().timestamp())
+        self.weighted_runs = {}
+        # Listen before loading, so no change is missed in between
+        self.listen()
+        return self.load()
+
+    def listen(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {TASK_SCHEDULES_CHANNEL}")
+
+    def unlisten(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"UNLISTEN {TASK_SCHEDULES_CHANNEL}")
+
+    def wait(self, timeout: float) -> list[int]:
+        """Waits up to timeout seconds for notifications and returns the notified schedule ids."""
+        raw_connection = connection.connection
+        # Notifications can also be received by the queries ran since the last wait. A lost
+        # connection is raised by poll() like by the other queries.
+        with connection.wrap_database_errors:
+            if (
+                not raw_connection.notifies
+                and select.select([raw_connection], [], [], timeout)[0]
+            ):
+                raw_connection.poll()
+        task_schedule_ids = [
+            int(notify.payload)
+            for notify in raw_connection.notifies
+            if notify.channel == TASK_SCHEDULES_CHANNEL
+        ]
+        raw_connection.notifies.clear()
+        return task_schedule_ids
+
+    def run_pending(self) -> tuple[int, int]:
+        """Reloads the runs if needed and fires all the due schedules."""
+        if now() >= self.reload_at:
+            self.load()
+
+        schedules_count = tasks_count = 0
+        due_schedule_ids = self.pop_due(now())
+        for index in range(0, len(due_schedule_ids), self.batch_size):
+            processed, created = self.fire(
+                due_schedule_ids[index : index + self.batch_size]
+            )
+            schedules_count += processed
+            tasks_count += created
+        return schedules_count, tasks_count
+
+    def wait_for_changes(self) -> None:
+        task_schedule_ids = self.wait(self.timeout())
+        if task_schedule_ids:
+            self.refresh(task_schedule_ids)
@@ -0,0 +1,155 @@
+import heapq
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.utils.timezone import now
+
+from tasks.dispatch import DispatchMode, dispatch_tasks
+from tasks.handlers import evaluate_due
+from tasks.models import Task, TaskSchedule
+
+# Levels above the lowest priority, as the broker serves priority 0 first. Schedules without a
+# priority are picked like the lowest one.
+PRIORITY_LEVELS: dict[int | None, int] = {
+    priority: 9 - priority for priority in range(10)
+} | {None: 0}
+
+
+def weighted_run_at(next_run_at: datetime, priority: int | None) -> datetime:
+    """
+    Returns when the run counts as due in the weighted fair order: every priority level above
+    the lowest counts as being due TASK_SCHEDULES_PRIORITY_AGING seconds earlier, so the higher
+    priorities go first under a backlog while the lower ones still age their way to the front.
+    """
+    return next_run_at - PRIORITY_LEVELS[priority] * timedelta(
+        seconds=settings.TASK_SCHEDULES_PRIORITY_AGING
+    )
+
+
+def process_batch(
+    batch_size: int, shard: int, shards: int, dispatch_mode: DispatchMode
+) -> tuple[int, int]:
+    """Claims a batch of due schedules and creates their tasks."""
+    task_schedule_ids = claim_schedules(batch_size, shard, shards)
+    if not task_schedule_ids:
+        return 0, 0
+    return process_schedules(task_schedule_ids, dispatch_mode)
+
+
+def due_schedules(
+    current_time: datetime, shard: int, shards: int, priority: int | None
+) -> QuerySet[TaskSchedule]:
+    # Only the due schedules of the priority are scanned, in due order, using the partial
+    # index on priority and next_run_at
+    task_schedules_queryset = (
+        TaskSchedule.objects.select_for_update(skip_locked=True)
+        .filter(
+            schedule_x_times__gt=0,
+            priority=priority,
+            next_run_at__lte=current_time,
+        )
+        .order_by("next_run_at")
+    )
+    if shards > 1:
+        task_schedules_queryset = task_schedules_queryset.alias(
+            shard=F("task_schedule_id") % shards
+        ).filter(shard=shard)
+    return task_schedules_queryset
+
+
+def claim_schedules(batch_size: int, shard: int, shards: int) -> list[int]:
+    current_time = now()
+
+    with transaction.atomic():
+        # The schedules are picked by the weighted fair order. The oldest due schedules of
+        # every priority are enough to merge them, so no query sorts the whole backlog.
+        weighted_schedules = [
+            (weighted_run_at(next_run_at, priority), task_schedule_id)
+            for priority in PRIORITY_LEVELS
+            for task_schedule_id, next_run_at in due_schedules(
+                current_time, shard, shards, priority
+            ).values_list("task_schedule_id", "next_run_at")[:batch_size]
+        ]
+        task_schedule_ids = [
+            task_schedule_id
+            for _, task_schedule_id in heapq.nsmallest(batch_size, weighted_schedules)
+        ]
+        # Lease the schedules by pushing their next run, so the other schedulers skip them
+        # once the locks are released. If this run dies before processing them, they are
+        # picked up again when the lease expires.
+        TaskSchedule.objects.filter(task_schedule_id__in=task_schedule_ids).update(
+            next_run_at=current_time + timedelta(seconds=settings.TASK_SCHEDULES_LEASE)
+        )
+
+    return task_schedule_ids
+
+
+def process_schedules(
+    task_schedule_ids: list[int], dispatch_mode: DispatchMode | None = None
+) -> tuple[int, int]:
+    current_time = now()
+    # Make sure that the claimed schedules don't get deleted while their tasks are created
+    task_schedules_queryset = TaskSchedule.objects.select_for_update().filter(
+        task_schedule_id__in=task_schedule_ids
+    )
+
+    with transaction.atomic():
+        task_schedules = list(task_schedules_queryset)
+        due_task_schedules = []
+        due_flags = evaluate_due(
+            task_schedules,
+            [schedule.last_task_created_at for schedule in task_schedules],
+            [schedule.tasks_created for schedule in task_schedules],
+            current_time,
+        )
+        for schedule, is_due in zip(task_schedules, due_flags):
+            if is_due:
+                due_task_schedules.append(schedule)
+                # Decrease schedule_x_times, keep track of the created tasks and plan the next run
+                schedule.schedule_x_times = F("schedule_x_times") - 1
+                schedule.tasks_created = F("tasks_created") + 1
+            else:
+                # Not due yet, so plan the run according to the last task. Otherwise,
+                # the schedule can't create tasks anymore and is no longer scanned.
+                next_run_at = (
+                    schedule.last_task_created_at + schedule.interval
+                    if schedule.last_task_created_at is not None
+                    else None
+                )
+                schedule.next_run_at = (
+                    next_run_at
+                    if next_run_at is not None and next_run_at > current_time
+                    else None
+                )
+            schedule.checked_scheduling_at = current_time
+
+        new_tasks = Task.objects.bulk_create(
+            Task(
+                operation=schedule.operation,
+                priority=schedule.priority,
+                task_schedule=schedule,
+            )
+            for schedule in due_task_schedules
+        )
+        # The next run is planned from the created task, which the due check is based on,
+        # so the runs neither drift nor fire early and get skipped
+        for schedule, task in zip(due_task_schedules, new_tasks):
+            schedule.last_task_created_at = task.created_at
+            schedule.next_run_at = task.created_at + schedule.interval
+        TaskSchedule.objects.bulk_update(
+            task_schedules,
+            [
+                "schedule_x_times",
+                "tasks_created",
+                "last_task_created_at",
+                "next_run_at",
+                "checked_scheduling_at",
+            ],
+        )
+
+        # send tasks to broker after db commit, once the locks are released
+        dispatch_tasks(new_tasks, dispatch_mode)
+
+    return len(task_schedules), len(new_tasks)
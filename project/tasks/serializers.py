@@ -1,20 +1,219 @@
 import random
-from typing import Self
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Self
 
+from django.conf import settings
+from django.db.models.manager import BaseManager
+from django.utils import timezone
+from drf_yasg.utils import swagger_serializer_method
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from tasks.models import Task, TaskSchedule
+from tasks.operations import parse_operation
+
+# Columns of a task in the order of TaskSerializer, for values() querysets
+TASK_FIELDS = (
+    "task_id",
+    "priority",
+    "operation",
+    "status",
+    "result",
+    "created_at",
+    "updated_at",
+    "task_schedule",
+)
+TASK_STATUS_FIELDS = ("task_id", "status", "result")
+
+TRAILING_DECIMAL_PATTERN = re.compile(r"\.0*\s*$")
+
+
+def set_default_priority(validated_data: dict) -> dict:
+    if validated_data.get("priority") is None:
+        validated_data["priority"] = random.randint(0, 9)
+
+    return validated_data
+
+
+@dataclass(slots=True)
+class TaskData:
+    operation: str
+    priority: int | None = None
+
+    def to_task(self) -> Task:
+        return Task(
+            operation=self.operation,
+            priority=(random.randint(0, 9) if self.priority is None else self.priority),
+        )
+
+
+def validate_operation(value: Any) -> str:
+    if value is None:
+        raise serializers.ValidationError("This field may not be null.", code="null")
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise serializers.ValidationError("Not a valid string.", code="invalid")
+    value = str(value).strip()
+    if not value:
+        raise serializers.ValidationError("This field may not be blank.", code="blank")
+    if parse_operation(value) is None:
+        raise serializers.ValidationError(
+            f'"{value}" is not a valid addition operation.', code="invalid"
+        )
+
+    return value
+
+
+def validate_priority(value: Any) -> int | None:
+    if value is None:
+        return None
+    if isinstance(value, str) and len(value) > 1000:
+        raise serializers.ValidationError(
+            "String value too large.", code="max_string_length"
+        )
+    try:
+        value = int(TRAILING_DECIMAL_PATTERN.sub("", str(value)))
+    except (TypeError, ValueError):
+        raise serializers.ValidationError(
+            "A valid integer is required.", code="invalid"
+        )
+    if value < 0:
+        raise serializers.ValidationError(
+            "Ensure this value is greater than or equal to 0.", code="min_value"
+        )
+    if value > 9:
+        raise serializers.ValidationError(
+            "Ensure this value is less than or equal to 9.", code="max_value"
+        )
+
+    return value
+
+
+def validate_task_data(data: Any) -> TaskData:
+    """
+    Validates a task of a batch like TaskSerializer does, with the same error messages.
+
+    The checks are plain functions on the input, without building the DRF fields and
+    running the model validators for every task.
+    """
+    if not isinstance(data, Mapping):
+        raise serializers.ValidationError(
+            {
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    f"Invalid data. Expected a dictionary, but got {type(data).__name__}."
+                ]
+            },
+            code="invalid",
+        )
+
+    # The errors are collected in the order of the fields of TaskSerializer
+    errors = {}
+    operation: str | None = None
+    priority: int | None = None
+    try:
+        priority = validate_priority(data.get("priority"))
+    except serializers.ValidationError as exc:
+        errors["priority"] = exc.detail
+    try:
+        if "operation" not in data:
+            raise serializers.ValidationError(
+                "This field is required.", code="required"
+            )
+        operation = validate_operation(data["operation"])
+    except serializers.ValidationError as exc:
+        errors["operation"] = exc.detail
+    if errors or operation is None:
+        raise serializers.ValidationError(errors)
+
+    return TaskData(operation=operation, priority=priority)
+
+
+def format_datetime(value: datetime | None) -> str | None:
+    if value is None:
+        return None
+    formatted = timezone.localtime(value).isoformat()
+    if formatted.endswith("+00:00"):
+        formatted = formatted[:-6] + "Z"
+    return formatted
+
+
+def task_representation(task: Task | dict) -> dict:
+    """Outputs a task, or a values() row of TASK_FIELDS, like TaskSerializer does."""
+    if isinstance(task, dict):
+        representation = dict(task)
+    else:
+        representation = {
+            "task_id": task.task_id,
+            "priority": task.priority,
+            "operation": task.operation,
+            "status": task.status,
+            "result": task.result,
+            "created_at": task.created_at,
+            "updated_at": task.updated_at,
+            "task_schedule": task.task_schedule_id,
+        }
+    representation["status"] = str(representation["status"])
+    if representation["result"] is not None:
+        representation["result"] = float(representation["result"])
+    representation["created_at"] = format_datetime(representation["created_at"])
+    representation["updated_at"] = format_datetime(representation["updated_at"])
+    return representation
+
+
+class TaskListSerializer(serializers.ListSerializer):
+    """
+    Validates and outputs many tasks at once without the DRF field machinery.
+
+    Batches are validated with validate_task_data and the tasks, or their values() rows,
+    are output with task_representation, both matching TaskSerializer.
+    """
+
+    def to_internal_value(self, data: list) -> list[TaskData]:
+        """
+        Validates every task and keeps the valid ones.
+
+        Errors of the invalid tasks are collected in item_errors together with their index,
+        so a batch can be partially created.
+        """
+        self.item_errors = []
+        validated_items = []
+        for index, item in enumerate(data):
+            try:
+                validated_items.append(validate_task_data(item))
+            except serializers.ValidationError as exc:
+                self.item_errors.append({"index": index, "errors": exc.detail})
+
+        return validated_items
+
+    def to_representation(self, data: Any) -> list[dict]:
+        if isinstance(data, BaseManager):
+            data = data.all()
+        return [task_representation(task) for task in data]
+
+    def create(self, validated_data: list[TaskData]) -> list[Task]:
+        # A single INSERT ... RETURNING for the whole batch
+        return Task.objects.bulk_create(item.to_task() for item in validated_data)
+
+    def save(self, **kwargs: Any) -> list[Task]:
+        # The validated tasks aren't dicts, so they can't be merged with kwargs like ListSerializer does
+        self.instance = self.create(self.validated_data)
+        return self.instance
 
 
 class TaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = Task
-        fields = "__all__"
+        # The dispatch time is internal to the reaper
+        exclude = ("dispatched_at",)
+        list_serializer_class = TaskListSerializer
         read_only_fields = (
             "task_id",
             "status",
             "result",
             "created_at",
+            "updated_at",
             "task_schedule",
         )
 
@@ -25,23 +224,32 @@ class TaskSerializer(serializers.ModelSerializer):
     )
 
     def create(self, validated_data: dict) -> Self:
-        if validated_data.get("priority") is None:
-            validated_data["priority"] = random.randint(0, 9)
-
-        return super().create(validated_data)
+        return super().create(set_default_priority(validated_data))
 
 
 class TaskScheduleSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaskSchedule
         fields = "__all__"
-        read_only_fields = ("task_schedule_id",)
+        read_only_fields = (
+            "task_schedule_id",
+            "next_run_at",
+            "tasks_created",
+            "last_task_created_at",
+        )
 
     every_x_days = serializers.IntegerField(required=False, allow_null=True)
     every_x_hours = serializers.IntegerField(required=False, allow_null=True)
-    tasks = TaskSerializer(
-        many=True, read_only=True
-    )  # Nested serializer for related tasks
+    tasks = serializers.SerializerMethodField()  # Latest tasks of the schedule
+
+    @swagger_serializer_method(serializer_or_field=TaskSerializer(many=True))
+    def get_tasks(self, task_schedule: TaskSchedule) -> list[dict]:
+        latest_tasks = getattr(task_schedule, "latest_tasks", None)
+        if latest_tasks is None:
+            latest_tasks = task_schedule.tasks.order_by("-created_at", "-task_id")[
+                : settings.TASK_SCHEDULE_LATEST_TASKS_COUNT
+            ]
+        return TaskSerializer(latest_tasks, many=True).data
 
     def validate(self, data):
         if not data.get("every_x_days") and not data.get("every_x_hours"):
@@ -50,3 +258,18 @@ class TaskScheduleSerializer(serializers.ModelSerializer):
             )
 
         return data
+
+
+class TaskIdsSerializer(serializers.Serializer):
+    task_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+    )
+
+    def validate_task_ids(self, value: list[int]) -> list[int]:
+        if len(value) > settings.TASKS_BULK_STATUS_MAX_IDS:
+            raise serializers.ValidationError(
+                f"Up to {settings.TASKS_BULK_STATUS_MAX_IDS} task ids can be looked up at once."
+            )
+
+        return value
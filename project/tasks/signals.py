@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tasks.models import TaskSchedule
+from tasks.scheduler import notify_task_schedule_changed
+
+
+@receiver(post_save, sender=TaskSchedule)
+@receiver(post_delete, sender=TaskSchedule)
+def task_schedule_changed(sender, instance: TaskSchedule, **kwargs) -> None:
+    notify_task_schedule_changed(instance.task_schedule_id)
@@ -1,16 +1,43 @@
+import asyncio
+import json
 from datetime import timedelta
+from io import StringIO
+from typing import Any
 from unittest import TestCase
-from unittest.mock import patch
-
-from django.core.management import call_command
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+import kombu.exceptions
+import redis
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.db import InterfaceError, OperationalError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from parameterized import parameterized
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
-from tasks.models import Task, TaskSchedule, TaskStatus
-
-from core.tasks import process_task
+from tasks.dispatch import (
+    DispatchMode,
+    message_signature,
+    priority_queue,
+    prune_outbox,
+    reap_stuck_tasks,
+    relay_outbox,
+    task_signatures,
+)
+from tasks.events import TaskEventPublisher, stream_task_events
+from tasks.handlers import evaluate_due, task_creation_check_chain
+from tasks.models import OutboxMessage, Task, TaskSchedule, TaskStatus
+from tasks.operations import evaluate_operation, parse_operation
+from tasks.result_cache import ResultCache
+from tasks.scheduler import Scheduler
+from tasks.scheduling import claim_schedules, process_schedules
+from tasks.serializers import TASK_FIELDS, TaskData, TaskSerializer
+from tasks.timing_wheel import TimingWheel
+
+from core.tasks import process_task, process_task_batch, reap_tasks, schedule_tasks
 
 
 class TaskViewSetTestCase(APITestCase):
@@ -142,6 +169,71 @@ class TaskViewSetTestCase(APITestCase):
         assert process_task.run((task_1.task_id, task_2.task_id))
         process_task.run.assert_called_once_with((task_1.task_id, task_2.task_id))
 
+    def test_batch_request_inserts_tasks_with_single_query(self) -> None:
+        tasks_data = [{"operation": f"{i}+{i}"} for i in range(100)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("task-batch-request"), tasks_data, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Task.objects.count(), 100)
+        self.assertEqual(
+            len(response.data["tasks"]),
+            len({task["task_id"] for task in response.data["tasks"]}),
+        )
+        inserts = [
+            query
+            for query in queries
+            if query["sql"].startswith('INSERT INTO "tasks_task"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list("task_ids", flat=True)),
+            sorted([task["task_id"]] for task in response.data["tasks"]),
+        )
+
+    def test_batch_request_batch_dispatch(self) -> None:
+        tasks_data = [
+            {"operation": "1+1", "priority": 5},
+            {"operation": "2+2", "priority": 5},
+        ]
+
+        response = self.client.post(
+            f"{reverse('task-batch-request')}?dispatch=batch",
+            tasks_data,
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        task_ids = [task["task_id"] for task in response.data["tasks"]]
+        (message,) = OutboxMessage.objects.all()
+        signature = message_signature(message)
+        self.assertEqual(signature.task, process_task_batch.name)
+        self.assertEqual(signature.args, (task_ids,))
+        self.assertIsNone(message.sent_at)
+
+    def test_create_task_writes_outbox_message(self) -> None:
+        response = self.client.post("/tasks/", {"operation": "1+1", "priority": 5})
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        (message,) = OutboxMessage.objects.all()
+        self.assertEqual(
+            (message.task_ids, message.priority, message.batch),
+            ([response.data["task_id"]], 5, False),
+        )
+
+    def test_batch_request_invalid_dispatch(self) -> None:
+        response = self.client.post(
+            f"{reverse('task-batch-request')}?dispatch=unknown",
+            [{"operation": "1+1"}],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Task.objects.count(), 0)
+
     def test_batch_request_exceeds_limit(self) -> None:
         tasks_data = [{"operation": f"{i}+{i}"} for i in range(101)]
 
@@ -188,6 +280,252 @@ class TaskViewSetTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertEqual(Task.objects.count(), 0)
 
+    def test_batch_stream_happy(self) -> None:
+        body = b"\n".join(
+            [
+                b'{"operation": "1+1", "priority": 5}',
+                b"",
+                b'{"operation": "2+2", "priority": "high"}',
+                b"not json",
+                b'{"operation": "3+3"}',
+            ]
+        )
+
+        response = self.client.post(
+            reverse("task-batch-stream"), body, content_type="application/x-ndjson"
+        )
+        results = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result["line"] for result in results], [1, 3, 4, 5])
+        self.assertEqual(results[0]["task"]["operation"], "1+1")
+        self.assertEqual(
+            results[1]["errors"], {"priority": ["A valid integer is required."]}
+        )
+        self.assertEqual(results[2]["errors"], "Invalid JSON.")
+        self.assertEqual(results[3]["task"]["operation"], "3+3")
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list("task_ids", flat=True)),
+            [[results[0]["task"]["task_id"]], [results[3]["task"]["task_id"]]],
+        )
+
+    @override_settings(TASKS_STREAM_CHUNK_SIZE=2)
+    def test_batch_stream_inserts_tasks_in_chunks(self) -> None:
+        body = b"\n".join(b'{"operation": "1+1"}' for _ in range(5))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("task-batch-stream"), body, content_type="application/x-ndjson"
+            )
+            b"".join(response.streaming_content)
+
+        self.assertEqual(Task.objects.count(), 5)
+        inserts = [
+            query
+            for query in queries
+            if query["sql"].startswith('INSERT INTO "tasks_task"')
+        ]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(OutboxMessage.objects.count(), 5)
+
+    def test_list_tasks_pages(self) -> None:
+        tasks = Task.objects.bulk_create(
+            Task(operation="1+1", priority=5) for _ in range(5)
+        )
+
+        task_ids: list[int] = []
+        url = reverse("task-list") + "?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            task_ids.extend(task["task_id"] for task in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(task_ids, [task.task_id for task in reversed(tasks)])
+
+    def test_list_tasks_filters(self) -> None:
+        task_schedule = TaskSchedule.objects.create(
+            operation="1+1", every_x_days=1, schedule_x_times=1
+        )
+        pending_task = Task.objects.create(
+            operation="1+1", priority=1, task_schedule=task_schedule
+        )
+        success_task = Task.objects.create(
+            operation="1+1", priority=2, status=TaskStatus.SUCCESS
+        )
+        error_task = Task.objects.create(
+            operation="1+1", priority=2, status=TaskStatus.ERROR
+        )
+        Task.objects.filter(task_id=error_task.task_id).update(
+            created_at=now() - timedelta(days=1)
+        )
+
+        def list_task_ids(query: str) -> list[int]:
+            response = self.client.get(reverse("task-list") + query)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [task["task_id"] for task in response.data["results"]]
+
+        self.assertEqual(
+            list_task_ids("?status=PENDING&status=ERROR"),
+            [pending_task.task_id, error_task.task_id],
+        )
+        self.assertEqual(
+            list_task_ids("?priority=2"), [success_task.task_id, error_task.task_id]
+        )
+        self.assertEqual(
+            list_task_ids(f"?task_schedule={task_schedule.task_schedule_id}"),
+            [pending_task.task_id],
+        )
+        created_at = (now() - timedelta(hours=1)).isoformat().replace("+", "%2B")
+        self.assertEqual(
+            list_task_ids(f"?created_after={created_at}"),
+            [success_task.task_id, pending_task.task_id],
+        )
+        self.assertEqual(
+            list_task_ids(f"?created_before={created_at}"), [error_task.task_id]
+        )
+
+    def test_bulk_status(self) -> None:
+        pending_task = Task.objects.create(operation="1+1", priority=1)
+        success_task = Task.objects.create(
+            operation="1+1", priority=1, status=TaskStatus.SUCCESS, result=2
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("task-bulk-status"),
+                {"task_ids": [success_task.task_id, pending_task.task_id, 999]},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            response.json(),
+            {
+                "tasks": [
+                    {
+                        "task_id": pending_task.task_id,
+                        "status": TaskStatus.PENDING,
+                        "result": None,
+                    },
+                    {
+                        "task_id": success_task.task_id,
+                        "status": TaskStatus.SUCCESS,
+                        "result": 2.0,
+                    },
+                ],
+                "not_found": [999],
+            },
+        )
+
+    @parameterized.expand(
+        [
+            ({},),
+            ({"task_ids": []},),
+            ({"task_ids": ["one"]},),
+            ({"task_ids": list(range(1, 7))},),
+        ]
+    )
+    @override_settings(TASKS_BULK_STATUS_MAX_IDS=5)
+    def test_bulk_status_invalid_data(self, data: dict) -> None:
+        response = self.client.post(reverse("task-bulk-status"), data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @parameterized.expand(
+        [
+            ("?status=DONE",),
+            ("?priority=high",),
+            ("?created_after=yesterday",),
+        ]
+    )
+    def test_list_tasks_invalid_filter(self, query: str) -> None:
+        response = self.client.get(reverse("task-list") + query)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncTaskViewsTestCase(APITestCase):
+    def test_create_task(self) -> None:
+        response = self.client.post(
+            reverse("async-task-list"),
+            {"operation": "1+1", "priority": 5},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        task = Task.objects.get()
+        self.assertEqual(response.json()["task_id"], task.task_id)
+        self.assertEqual((task.operation, task.priority), ("1+1", 5))
+        (message,) = OutboxMessage.objects.all()
+        self.assertEqual((message.task_ids, message.batch), ([task.task_id], False))
+
+    @parameterized.expand([("not json",), ('{"operation": "1-1"}',)])
+    def test_create_task_invalid_data(self, body: str) -> None:
+        response = self.client.post(
+            reverse("async-task-list"), body, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Task.objects.count(), 0)
+        self.assertEqual(OutboxMessage.objects.count(), 0)
+
+    def test_retrieve_task(self) -> None:
+        task = Task.objects.create(operation="1+1", priority=5)
+
+        response = self.client.get(reverse("async-task-detail", args=[task.task_id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(), self.client.get(f"/tasks/{task.task_id}/").json()
+        )
+
+    def test_retrieve_task_not_found(self) -> None:
+        response = self.client.get(reverse("async-task-detail", args=[999]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_batch_request(self) -> None:
+        response = self.client.post(
+            reverse("async-task-batch-request") + "?dispatch=batch",
+            [
+                {"operation": "1+1", "priority": 5},
+                {"operation": "invalid", "priority": 5},
+                {"operation": "2+2", "priority": 5},
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response_data = response.json()
+        self.assertEqual(response_data["errors"][0]["index"], 1)
+        task_ids = list(
+            Task.objects.order_by("task_id").values_list("task_id", flat=True)
+        )
+        self.assertEqual([task["task_id"] for task in response_data["tasks"]], task_ids)
+        (message,) = OutboxMessage.objects.all()
+        self.assertEqual((message.task_ids, message.batch), (task_ids, True))
+
+    @parameterized.expand(
+        [
+            ("", {"operation": "1+1"}),
+            ("", [{"operation": "1+1"}] * 101),
+            ("?dispatch=stream", [{"operation": "1+1"}]),
+        ]
+    )
+    def test_batch_request_invalid(self, query: str, data: dict | list) -> None:
+        response = self.client.post(
+            reverse("async-task-batch-request") + query, data, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Task.objects.count(), 0)
+
 
 class TaskScheduleViewSetTestCase(APITestCase):
     def test_create_task_schedule_happy(self) -> None:
@@ -241,6 +579,18 @@ class TaskScheduleViewSetTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(TaskSchedule.objects.count(), 0)
 
+    def test_create_task_schedule_multi_term_operation(self) -> None:
+        response = self.client.post(
+            reverse("task-schedule-list"),
+            {
+                "operation": "1+2+3",
+                "every_x_hours": 2,
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(TaskSchedule.objects.get().operation, "1+2+3")
+
     def test_create_task_schedule_missing_every_x_fields(self) -> None:
         response = self.client.post(
             reverse("task-schedule-list"),
@@ -282,6 +632,91 @@ class TaskScheduleViewSetTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    @override_settings(TASK_SCHEDULE_LATEST_TASKS_COUNT=10)
+    def test_retrieve_task_schedule_latest_tasks(self) -> None:
+        task_schedule = TaskSchedule.objects.create(
+            operation="1+1", every_x_days=2, schedule_x_times=3
+        )
+        tasks = Task.objects.bulk_create(
+            Task(operation="1+1", priority=5, task_schedule=task_schedule)
+            for _ in range(15)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("task-schedule-detail", args=[task_schedule.task_schedule_id])
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            [task["task_id"] for task in response.data["tasks"]],
+            [task.task_id for task in reversed(tasks)][:10],
+        )
+
+    def test_list_task_schedule_tasks(self) -> None:
+        task_schedule = TaskSchedule.objects.create(
+            operation="1+1", every_x_days=2, schedule_x_times=3
+        )
+        tasks = Task.objects.bulk_create(
+            Task(operation="1+1", priority=5, task_schedule=task_schedule)
+            for _ in range(5)
+        )
+        Task.objects.create(operation="1+1", priority=5)
+
+        task_ids: list[int] = []
+        url = (
+            reverse("task-schedule-tasks", args=[task_schedule.task_schedule_id])
+            + "?page_size=2"
+        )
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            task_ids.extend(task["task_id"] for task in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(task_ids, [task.task_id for task in reversed(tasks)])
+
+    def test_list_task_schedules(self) -> None:
+        active_schedule = TaskSchedule.objects.create(
+            operation="1+1", priority=1, every_x_days=1, schedule_x_times=1
+        )
+        exhausted_schedule = TaskSchedule.objects.create(
+            operation="1+1", priority=2, every_x_days=1, schedule_x_times=0
+        )
+        Task.objects.bulk_create(
+            Task(operation="1+1", priority=1, task_schedule=schedule)
+            for schedule in (active_schedule, exhausted_schedule)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("task-schedule-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            [schedule["task_schedule_id"] for schedule in response.data["results"]],
+            [exhausted_schedule.task_schedule_id, active_schedule.task_schedule_id],
+        )
+        self.assertEqual(len(response.data["results"][0]["tasks"]), 1)
+
+        response = self.client.get(reverse("task-schedule-list") + "?active=true")
+        self.assertEqual(
+            [schedule["task_schedule_id"] for schedule in response.data["results"]],
+            [active_schedule.task_schedule_id],
+        )
+        response = self.client.get(reverse("task-schedule-list") + "?priority=2")
+        self.assertEqual(
+            [schedule["task_schedule_id"] for schedule in response.data["results"]],
+            [exhausted_schedule.task_schedule_id],
+        )
+
+    def test_list_task_schedule_tasks_not_found(self) -> None:
+        response = self.client.get(reverse("task-schedule-tasks", args=[999]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_delete_task_schedule_happy(self) -> None:
         task_schedule = TaskSchedule.objects.create(
             operation="1+1",
@@ -324,6 +759,7 @@ class ProcessTaskSchedulesCommandTestCase(TestCase):
     def tearDown(self) -> None:
         Task.objects.all().delete()
         TaskSchedule.objects.all().delete()
+        OutboxMessage.objects.all().delete()
 
     @patch("core.tasks.process_task.run")
     def test_command_creates_tasks(self, _) -> None:
@@ -380,6 +816,10 @@ class ProcessTaskSchedulesCommandTestCase(TestCase):
         task = Task.objects.filter(task_schedule=self.schedule1).first()
         task.created_at = now() - timedelta(days=2)
         task.save()
+        # Simulate that the next run of the schedule is due
+        self.schedule1.last_task_created_at = task.created_at
+        self.schedule1.next_run_at = task.created_at + self.schedule1.interval
+        self.schedule1.save(update_fields=["last_task_created_at", "next_run_at"])
 
         call_command("process_task_schedules")
         # Assert multiple tasks were created
@@ -389,6 +829,155 @@ class ProcessTaskSchedulesCommandTestCase(TestCase):
         self.schedule1.refresh_from_db()
         self.assertEqual(self.schedule1.schedule_x_times, 1)
 
+    def test_command_plans_next_run(self) -> None:
+        call_command("process_task_schedules")
+
+        self.schedule1.refresh_from_db()
+        task = Task.objects.get(task_schedule=self.schedule1)
+        self.assertEqual(self.schedule1.tasks_created, 1)
+        self.assertEqual(self.schedule1.last_task_created_at, task.created_at)
+        self.assertEqual(
+            self.schedule1.next_run_at, task.created_at + timedelta(days=1)
+        )
+
+    def test_command_skips_schedules_which_are_not_due(self) -> None:
+        self.schedule1.next_run_at = now() + timedelta(hours=1)
+        self.schedule1.save(update_fields=["next_run_at"])
+
+        call_command("process_task_schedules")
+
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertFalse(Task.objects.filter(task_schedule=self.schedule1).exists())
+
+    def test_command_reschedules_schedules_which_are_not_due(self) -> None:
+        last_task_created_at = now() - timedelta(hours=1)
+        self.schedule1.tasks_created = 1
+        self.schedule1.last_task_created_at = last_task_created_at
+        self.schedule1.save(update_fields=["tasks_created", "last_task_created_at"])
+
+        call_command("process_task_schedules")
+
+        self.assertFalse(Task.objects.filter(task_schedule=self.schedule1).exists())
+        self.schedule1.refresh_from_db()
+        self.assertEqual(self.schedule1.schedule_x_times, 3)
+        self.assertEqual(
+            self.schedule1.next_run_at, last_task_created_at + timedelta(days=1)
+        )
+
+    def test_command_drains_due_schedules_in_batches(self) -> None:
+        call_command("process_task_schedules", batch_size=1, time_budget=60)
+
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_command_stops_when_time_budget_is_exhausted(self) -> None:
+        call_command("process_task_schedules", batch_size=1, time_budget=0)
+
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_claimed_schedules_are_skipped_by_other_runs(self) -> None:
+        task_schedule_ids = claim_schedules(batch_size=1, shard=0, shards=1)
+
+        self.assertEqual(len(task_schedule_ids), 1)
+        claimed_schedule = TaskSchedule.objects.get(
+            task_schedule_id=task_schedule_ids[0]
+        )
+        self.assertGreater(claimed_schedule.next_run_at, now())
+
+        call_command("process_task_schedules")
+
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertFalse(Task.objects.filter(task_schedule=claimed_schedule).exists())
+
+    @override_settings(TASK_SCHEDULES_PRIORITY_AGING=60)
+    def test_claim_schedules_by_weighted_fair_order(self) -> None:
+        TaskSchedule.objects.filter(
+            task_schedule_id=self.schedule1.task_schedule_id
+        ).update(priority=8, next_run_at=now() - timedelta(minutes=2))
+        TaskSchedule.objects.filter(
+            task_schedule_id=self.schedule2.task_schedule_id
+        ).update(priority=0, next_run_at=now() - timedelta(minutes=1))
+
+        # The higher priority goes first, although it is due later
+        self.assertEqual(
+            claim_schedules(batch_size=1, shard=0, shards=1),
+            [self.schedule2.task_schedule_id],
+        )
+
+        # Once waiting long enough, the lower priority goes first
+        TaskSchedule.objects.filter(
+            task_schedule_id=self.schedule1.task_schedule_id
+        ).update(next_run_at=now() - timedelta(minutes=20))
+        TaskSchedule.objects.filter(
+            task_schedule_id=self.schedule2.task_schedule_id
+        ).update(next_run_at=now() - timedelta(minutes=1))
+        self.assertEqual(
+            claim_schedules(batch_size=1, shard=0, shards=1),
+            [self.schedule1.task_schedule_id],
+        )
+
+    @override_settings(TASK_SCHEDULES_PRIORITY_AGING=60)
+    def test_claim_schedules_without_priority_as_lowest(self) -> None:
+        TaskSchedule.objects.filter(
+            task_schedule_id=self.schedule1.task_schedule_id
+        ).update(priority=None, next_run_at=now() - timedelta(minutes=2))
+        TaskSchedule.objects.filter(
+            task_schedule_id=self.schedule2.task_schedule_id
+        ).update(priority=8, next_run_at=now() - timedelta(seconds=61))
+
+        self.assertEqual(
+            claim_schedules(batch_size=2, shard=0, shards=1),
+            [self.schedule2.task_schedule_id, self.schedule1.task_schedule_id],
+        )
+
+    def test_claimed_schedules_are_processed(self) -> None:
+        task_schedule_ids = claim_schedules(batch_size=2, shard=0, shards=1)
+
+        self.assertEqual(process_schedules(task_schedule_ids), (2, 2))
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_command_processes_only_its_shard(self) -> None:
+        shard = self.schedule1.task_schedule_id % 2
+
+        call_command("process_task_schedules", shard=shard, shards=2)
+
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertTrue(Task.objects.filter(task_schedule=self.schedule1).exists())
+
+    def test_command_rejects_invalid_shard(self) -> None:
+        with self.assertRaises(CommandError):
+            call_command("process_task_schedules", shard=2, shards=2)
+
+        self.assertEqual(Task.objects.count(), 0)
+
+    @patch("core.tasks.group")
+    def test_schedule_tasks_fans_out_shards(self, group_mock) -> None:
+        schedule_tasks(shards=3)
+
+        signatures = list(group_mock.call_args.args[0])
+        self.assertEqual(
+            [signature.kwargs["shard"] for signature in signatures], [0, 1, 2]
+        )
+        group_mock.return_value.apply_async.assert_called_once()
+        self.assertEqual(Task.objects.count(), 0)
+
+    def test_command_queries_do_not_depend_on_batch_size(self) -> None:
+        with CaptureQueriesContext(connection) as small_batch:
+            call_command("process_task_schedules")
+
+        Task.objects.all().delete()
+        TaskSchedule.objects.all().delete()
+        TaskSchedule.objects.bulk_create(
+            TaskSchedule(operation="1+1", priority=1, every_x_hours=1)
+            for _ in range(20)
+        )
+
+        with CaptureQueriesContext(connection) as large_batch:
+            call_command("process_task_schedules")
+
+        self.assertEqual(Task.objects.count(), 20)
+        self.assertEqual(OutboxMessage.objects.count(), 22)
+        self.assertEqual(len(small_batch), len(large_batch))
+
 
 class ProcessTaskTestCase(TestCase):
     def setUp(self) -> None:
@@ -397,6 +986,9 @@ class ProcessTaskTestCase(TestCase):
             priority=5,
         )
 
+    def tearDown(self) -> None:
+        Task.objects.all().delete()
+
     def test_process_task_success(self) -> None:
         # Call the Celery task
         process_task(self.task.task_id)
@@ -433,3 +1025,913 @@ class ProcessTaskTestCase(TestCase):
 
         # Assert the task does not exist
         self.assertFalse(Task.objects.filter(task_id=task_id).exists())
+
+    def test_process_task_already_processed(self) -> None:
+        # Simulate a duplicate delivery of a processed task
+        self.task.status = TaskStatus.SUCCESS
+        self.task.result = 15.0
+        self.task.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            process_task(self.task.task_id)
+
+        self.assertEqual(len(queries), 1)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, TaskStatus.SUCCESS)
+        self.assertEqual(self.task.result, 15.0)
+
+    @override_settings(TASKS_RESULT_CACHE_ENABLED=True)
+    @patch("core.tasks.time.sleep")
+    @patch("core.tasks.result_cache")
+    def test_process_task_cached_result(self, result_cache_mock, sleep_mock) -> None:
+        result_cache_mock.get_many.return_value = {"5+10": 15.0}
+
+        process_task(self.task.task_id)
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, TaskStatus.SUCCESS)
+        self.assertEqual(self.task.result, 15.0)
+        sleep_mock.assert_not_called()
+        result_cache_mock.set_many.assert_not_called()
+
+    @override_settings(TASKS_RESULT_CACHE_ENABLED=True)
+    @patch("core.tasks.time.sleep")
+    @patch("core.tasks.result_cache")
+    def test_process_task_caches_result(self, result_cache_mock, sleep_mock) -> None:
+        result_cache_mock.get_many.return_value = {}
+
+        process_task(self.task.task_id)
+
+        sleep_mock.assert_called_once()
+        result_cache_mock.set_many.assert_called_once_with({"5+10": 15.0})
+
+    @patch("core.tasks.time.sleep")
+    @patch("tasks.events.task_event_publisher.publish")
+    def test_process_task_publishes_transitions(self, publish_mock, _) -> None:
+        statuses: list[tuple[int, str, float | None]] = []
+        publish_mock.side_effect = lambda tasks: statuses.extend(
+            (task.task_id, task.status, task.result) for task in tasks
+        )
+
+        process_task(self.task.task_id)
+
+        self.assertEqual(
+            statuses,
+            [
+                (self.task.task_id, TaskStatus.STARTED, None),
+                (self.task.task_id, TaskStatus.SUCCESS, 15.0),
+            ],
+        )
+
+    def test_start_only_pending_tasks(self) -> None:
+        started_task = Task.objects.create(
+            operation="1+1", priority=1, status=TaskStatus.STARTED
+        )
+
+        tasks = Task.objects.start([self.task.task_id, started_task.task_id])
+
+        self.assertEqual(
+            [(task.task_id, task.operation, task.priority) for task in tasks],
+            [(self.task.task_id, "5+10", 5)],
+        )
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, TaskStatus.STARTED)
+
+    def test_start_only_filtered_tasks(self) -> None:
+        other_task = Task.objects.create(operation="1+1", priority=1)
+
+        tasks = Task.objects.filter(priority=1).start(
+            [self.task.task_id, other_task.task_id]
+        )
+
+        self.assertEqual([task.task_id for task in tasks], [other_task.task_id])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, TaskStatus.PENDING)
+
+    def test_status_changes_renew_updated_at(self) -> None:
+        other_task = Task.objects.create(operation="1+1", priority=1)
+
+        Task.objects.start([other_task.task_id])
+        process_task(self.task.task_id)
+
+        for task in (self.task, other_task):
+            updated_at = task.updated_at
+            task.refresh_from_db()
+            self.assertLess(updated_at, task.updated_at)
+
+
+class ProcessTaskBatchTestCase(TestCase):
+    def setUp(self) -> None:
+        self.tasks = [
+            Task.objects.create(operation="5+10", priority=5),
+            Task.objects.create(operation="1.5+2", priority=5),
+            Task.objects.create(operation="invalid+operation", priority=5),
+        ]
+
+    def tearDown(self) -> None:
+        Task.objects.all().delete()
+
+    @patch("core.tasks.time.sleep")
+    def test_process_task_batch(self, _) -> None:
+        task_ids = [task.task_id for task in self.tasks]
+
+        with CaptureQueriesContext(connection) as queries:
+            process_task_batch(task_ids + [max(task_ids) + 1])
+
+        task_queries = [query for query in queries if "tasks_task" in query["sql"]]
+        self.assertEqual(len(task_queries), 2)
+        batch_tasks = Task.objects.filter(task_id__in=task_ids)
+        statuses = dict(batch_tasks.values_list("operation", "status"))
+        results = dict(batch_tasks.values_list("operation", "result"))
+        self.assertEqual(statuses["5+10"], TaskStatus.SUCCESS)
+        self.assertEqual(results["5+10"], 15.0)
+        self.assertEqual(statuses["1.5+2"], TaskStatus.SUCCESS)
+        self.assertEqual(results["1.5+2"], 3.5)
+        self.assertEqual(statuses["invalid+operation"], TaskStatus.ERROR)
+        self.assertIsNone(results["invalid+operation"])
+
+    @patch("tasks.events.task_event_publisher.publish")
+    @patch("core.tasks.time.sleep")
+    def test_process_task_batch_skips_tasks_sent_again(self, _, publish_mock) -> None:
+        reaped_task = self.tasks[0]
+
+        def reap_task(operation: str) -> float:
+            # The reaper sends the task to processing again while the batch is processed
+            Task.objects.filter(task_id=reaped_task.task_id).update(
+                status=TaskStatus.PENDING
+            )
+            return evaluate_operation(operation)
+
+        with patch("core.tasks.evaluate_operation", side_effect=reap_task):
+            process_task_batch([task.task_id for task in self.tasks])
+
+        reaped_task.refresh_from_db()
+        self.assertEqual(reaped_task.status, TaskStatus.PENDING)
+        self.assertIsNone(reaped_task.result)
+        finished_events = publish_mock.call_args_list[-1].args[0]
+        self.assertEqual(
+            [(task.task_id, task.status) for task in finished_events],
+            [
+                (self.tasks[1].task_id, TaskStatus.SUCCESS),
+                (self.tasks[2].task_id, TaskStatus.ERROR),
+            ],
+        )
+
+
+class TaskSignaturesTestCase(TestCase):
+    def setUp(self) -> None:
+        self.tasks = [
+            Task(task_id=1, operation="1+1", priority=1),
+            Task(task_id=2, operation="1+1", priority=9),
+            Task(task_id=3, operation="1+1", priority=1),
+            Task(task_id=4, operation="1+1", priority=1),
+        ]
+
+    def test_single_dispatch(self) -> None:
+        signatures = task_signatures(self.tasks, DispatchMode.SINGLE)
+
+        self.assertEqual(
+            [signature.args for signature in signatures], [(1,), (2,), (3,), (4,)]
+        )
+        self.assertEqual(
+            [signature.options["priority"] for signature in signatures], [1, 9, 1, 1]
+        )
+        self.assertEqual(
+            [signature.options["queue"] for signature in signatures],
+            ["tasks", "tasks", "tasks", "tasks"],
+        )
+
+    @parameterized.expand(
+        [
+            (0, "tasks-high"),
+            (2, "tasks-high"),
+            (3, "tasks"),
+            (6, "tasks"),
+            (7, "tasks-low"),
+            (9, "tasks-low"),
+        ]
+    )
+    @override_settings(
+        TASKS_PRIORITY_QUEUES_ENABLED=True, TASKS_HIGH_PRIORITY=2, TASKS_LOW_PRIORITY=7
+    )
+    def test_priority_queue(self, priority: int, queue: str) -> None:
+        self.assertEqual(priority_queue(priority), queue)
+
+    @override_settings(TASKS_PRIORITY_QUEUES_ENABLED=False)
+    def test_priority_queues_disabled(self) -> None:
+        self.assertEqual(
+            {priority_queue(priority) for priority in range(10)}, {"tasks"}
+        )
+
+    @override_settings(TASKS_DISPATCH_BATCH_SIZE=2)
+    def test_batch_dispatch_groups_tasks_per_priority(self) -> None:
+        signatures = task_signatures(self.tasks, DispatchMode.BATCH)
+
+        self.assertEqual(
+            [
+                (signature.args, signature.options["priority"])
+                for signature in signatures
+            ],
+            [(([1, 3],), 1), (([4],), 1), (([2],), 9)],
+        )
+
+
+class RelayOutboxTestCase(TestCase):
+    def tearDown(self) -> None:
+        Task.objects.all().delete()
+        OutboxMessage.objects.all().delete()
+
+    @patch("tasks.dispatch.group")
+    def test_relay_publishes_unsent_messages(self, group_mock) -> None:
+        OutboxMessage.objects.create(task_ids=[1], priority=1, sent_at=now())
+        messages = OutboxMessage.objects.bulk_create(
+            [
+                OutboxMessage(task_ids=[2], priority=9),
+                OutboxMessage(task_ids=[3, 4], priority=1, batch=True),
+                OutboxMessage(task_ids=[5], priority=1),
+            ]
+        )
+
+        self.assertEqual(relay_outbox(batch_size=2), 2)
+
+        signatures = list(group_mock.call_args.args[0])
+        self.assertEqual(
+            [(signature.task, signature.args) for signature in signatures],
+            [(process_task.name, (2,)), (process_task_batch.name, ([3, 4],))],
+        )
+        group_mock.return_value.apply_async.assert_called_once()
+        self.assertEqual(
+            list(
+                OutboxMessage.objects.filter(sent_at__isnull=True).values_list(
+                    "outbox_message_id", flat=True
+                )
+            ),
+            [messages[2].outbox_message_id],
+        )
+
+    @patch("tasks.dispatch.group")
+    def test_relay_starts_the_lease_of_pending_tasks(self, group_mock) -> None:
+        pending_task = Task.objects.create(operation="1+1", priority=1)
+        started_task = Task.objects.create(
+            operation="1+2", priority=1, status=TaskStatus.STARTED
+        )
+        OutboxMessage.objects.create(
+            task_ids=[pending_task.task_id, started_task.task_id],
+            priority=1,
+            batch=True,
+        )
+
+        relay_outbox(batch_size=10)
+
+        pending_task.refresh_from_db()
+        started_task.refresh_from_db()
+        self.assertEqual(
+            pending_task.dispatched_at, OutboxMessage.objects.get().sent_at
+        )
+        self.assertIsNone(started_task.dispatched_at)
+
+    @patch("tasks.dispatch.group")
+    def test_relay_keeps_messages_when_publishing_fails(self, group_mock) -> None:
+        group_mock.return_value.apply_async.side_effect = ConnectionError
+        OutboxMessage.objects.create(task_ids=[1], priority=1)
+
+        with self.assertRaises(ConnectionError):
+            relay_outbox(batch_size=10)
+
+        self.assertTrue(OutboxMessage.objects.get().sent_at is None)
+
+    @override_settings(TASKS_OUTBOX_RETENTION=3600)
+    def test_prune_outbox(self) -> None:
+        OutboxMessage.objects.bulk_create(
+            [
+                OutboxMessage(task_ids=[1], priority=1),
+                OutboxMessage(task_ids=[2], priority=1, sent_at=now()),
+                OutboxMessage(
+                    task_ids=[3], priority=1, sent_at=now() - timedelta(hours=2)
+                ),
+            ]
+        )
+
+        self.assertEqual(prune_outbox(), 1)
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list("task_ids", flat=True)),
+            [[1], [2]],
+        )
+
+    @patch("tasks.dispatch.group")
+    def test_relay_outbox_command_drains_outbox(self, group_mock) -> None:
+        OutboxMessage.objects.bulk_create(
+            OutboxMessage(task_ids=[task_id], priority=1) for task_id in range(5)
+        )
+        stdout = StringIO()
+
+        call_command("relay_outbox", batch_size=2, once=True, stdout=stdout)
+
+        self.assertEqual(group_mock.return_value.apply_async.call_count, 3)
+        self.assertFalse(OutboxMessage.objects.filter(sent_at__isnull=True).exists())
+        self.assertIn("Published 5 outbox messages.", stdout.getvalue())
+
+    @patch("tasks.management.commands.relay_outbox.time.sleep")
+    @patch("tasks.management.commands.relay_outbox.relay_outbox")
+    def test_relay_outbox_command_backs_off_on_errors(
+        self, relay_outbox_mock, sleep_mock
+    ) -> None:
+        relay_outbox_mock.side_effect = [
+            kombu.exceptions.OperationalError,
+            redis.ConnectionError,
+            OperationalError,
+            1,
+        ]
+        stdout = StringIO()
+
+        with self.assertLogs(
+            "tasks.management.commands.relay_outbox", level="WARNING"
+        ) as logs:
+            call_command(
+                "relay_outbox", batch_size=2, poll_interval=1, once=True, stdout=stdout
+            )
+
+        self.assertEqual(len(logs.output), 3)
+        self.assertEqual(sleep_mock.call_args_list, [call(1), call(2), call(4)])
+        self.assertIn("Published 1 outbox messages.", stdout.getvalue())
+
+
+class ReapStuckTasksTestCase(TestCase):
+    def setUp(self) -> None:
+        stale_at = now() - timedelta(minutes=15)
+        self.stuck_tasks = [
+            Task.objects.create(operation="1+1", priority=1),
+            Task.objects.create(operation="1+2", priority=2),
+            Task.objects.create(operation="1+3", priority=3, status=TaskStatus.STARTED),
+        ]
+        Task.objects.filter(
+            task_id__in=[task.task_id for task in self.stuck_tasks]
+        ).update(updated_at=stale_at, dispatched_at=stale_at)
+        # Recently sent, not yet sent, recently updated or finished tasks are left alone
+        Task.objects.create(operation="1+4", priority=4, dispatched_at=now())
+        unsent_task = Task.objects.create(operation="1+7", priority=7)
+        Task.objects.filter(task_id=unsent_task.task_id).update(updated_at=stale_at)
+        Task.objects.create(operation="1+5", priority=5, status=TaskStatus.STARTED)
+        finished_task = Task.objects.create(
+            operation="1+6", priority=6, status=TaskStatus.SUCCESS, result=7
+        )
+        Task.objects.filter(task_id=finished_task.task_id).update(updated_at=stale_at)
+
+    def tearDown(self) -> None:
+        Task.objects.all().delete()
+        OutboxMessage.objects.all().delete()
+
+    @override_settings(TASKS_LEASE=600, TASKS_DISPATCH_MODE="single")
+    def test_reap_stuck_tasks(self) -> None:
+        reaped = reap_stuck_tasks(batch_size=1)
+
+        self.assertEqual(reaped, {TaskStatus.PENDING: 2, TaskStatus.STARTED: 1})
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list("task_ids", flat=True)),
+            sorted([task.task_id] for task in self.stuck_tasks),
+        )
+        self.assertEqual(
+            set(
+                Task.objects.filter(
+                    task_id__in=[task.task_id for task in self.stuck_tasks]
+                ).values_list("status", "dispatched_at")
+            ),
+            {(TaskStatus.PENDING, None)},
+        )
+        # The lease is renewed, so a second sweep finds nothing
+        self.assertEqual(
+            reap_stuck_tasks(batch_size=1),
+            {TaskStatus.PENDING: 0, TaskStatus.STARTED: 0},
+        )
+
+    @override_settings(TASKS_LEASE=600, TASKS_DISPATCH_MODE="single")
+    def test_reaped_started_task_is_processed_again(self) -> None:
+        reap_stuck_tasks(batch_size=10)
+
+        process_task(self.stuck_tasks[2].task_id)
+
+        self.stuck_tasks[2].refresh_from_db()
+        self.assertEqual(self.stuck_tasks[2].status, TaskStatus.SUCCESS)
+        self.assertEqual(self.stuck_tasks[2].result, 4.0)
+
+    @override_settings(TASKS_LEASE=600, TASKS_DISPATCH_MODE="single")
+    def test_reap_tasks_returns_counts(self) -> None:
+        self.assertEqual(reap_tasks(), {TaskStatus.PENDING: 2, TaskStatus.STARTED: 1})
+
+
+class SchedulerTestCase(TestCase):
+    def setUp(self) -> None:
+        self.due_schedule = TaskSchedule.objects.create(
+            operation="1+1",
+            priority=1,
+            schedule_x_times=2,
+            every_x_hours=1,
+            next_run_at=now() - timedelta(seconds=1),
+        )
+        # Not due within the horizon or not creating tasks anymore
+        TaskSchedule.objects.create(
+            operation="1+2", every_x_hours=1, next_run_at=now() + timedelta(hours=1)
+        )
+        TaskSchedule.objects.create(
+            operation="1+3", every_x_hours=1, schedule_x_times=0, next_run_at=now()
+        )
+        self.scheduler = Scheduler(horizon=60, batch_size=10)
+
+    def tearDown(self) -> None:
+        Task.objects.all().delete()
+        TaskSchedule.objects.all().delete()
+        OutboxMessage.objects.all().delete()
+
+    def test_load_keeps_runs_within_horizon(self) -> None:
+        self.assertEqual(self.scheduler.load(), 1)
+        self.assertEqual(len(self.scheduler.wheel), 1)
+        self.assertIn(self.due_schedule.task_schedule_id, self.scheduler.wheel)
+        self.assertEqual(self.scheduler.timeout(), 0)
+
+    def test_run_pending_fires_due_schedules(self) -> None:
+        self.assertEqual(self.scheduler.run_pending(), (1, 1))
+
+        self.assertEqual(
+            list(Task.objects.values_list("task_schedule", flat=True)),
+            [self.due_schedule.task_schedule_id],
+        )
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+        # The next run is in an hour, so it is left out until a later load
+        self.assertEqual(len(self.scheduler.wheel), 0)
+        self.assertGreater(self.scheduler.timeout(), 0)
+        self.assertEqual(self.scheduler.run_pending(), (0, 0))
+
+    def test_pop_due_skips_outdated_runs(self) -> None:
+        self.scheduler.loaded_until = now() + timedelta(minutes=1)
+        self.scheduler.schedule(1, now() - timedelta(seconds=2), 1)
+        self.scheduler.schedule(1, now() - timedelta(seconds=1), 1)
+        self.scheduler.schedule(2, now() + timedelta(seconds=30), 1)
+
+        self.assertEqual(self.scheduler.pop_due(now()), [1])
+        self.assertEqual(self.scheduler.pop_due(now()), [])
+        self.assertEqual(len(self.scheduler.wheel), 1)
+        self.assertIn(2, self.scheduler.wheel)
+
+    def test_connect_reloads_runs(self) -> None:
+        self.scheduler.schedule(1, now(), 1)
+
+        self.assertEqual(self.scheduler.connect(), 1)
+        try:
+            self.assertNotIn(1, self.scheduler.wheel)
+            self.assertIn(self.due_schedule.task_schedule_id, self.scheduler.wheel)
+            schedule = TaskSchedule.objects.create(operation="2+2", every_x_hours=1)
+            self.assertEqual(self.scheduler.wait(1), [schedule.task_schedule_id])
+        finally:
+            self.scheduler.unlisten()
+
+    @override_settings(TASK_SCHEDULES_PRIORITY_AGING=60)
+    def test_run_pending_fires_higher_priorities_first(self) -> None:
+        older_schedule = TaskSchedule.objects.create(
+            operation="1+9",
+            priority=9,
+            every_x_hours=1,
+            next_run_at=now() - timedelta(minutes=2),
+        )
+        TaskSchedule.objects.filter(
+            task_schedule_id=self.due_schedule.task_schedule_id
+        ).update(priority=0)
+        # A single schedule is fired at a time
+        scheduler = Scheduler(horizon=60, batch_size=1)
+
+        with patch.object(scheduler, "fire", wraps=scheduler.fire) as fire_mock:
+            self.assertEqual(scheduler.run_pending(), (2, 2))
+
+        self.assertEqual(
+            fire_mock.call_args_list,
+            [
+                call([self.due_schedule.task_schedule_id]),
+                call([older_schedule.task_schedule_id]),
+            ],
+        )
+
+    def test_notifications_refresh_schedules(self) -> None:
+        self.scheduler.load()
+        self.scheduler.listen()
+        try:
+            schedule = TaskSchedule.objects.create(operation="2+2", every_x_hours=1)
+            self.assertEqual(self.scheduler.wait(1), [schedule.task_schedule_id])
+            self.scheduler.refresh([schedule.task_schedule_id])
+            self.assertIn(schedule.task_schedule_id, self.scheduler.wheel)
+
+            task_schedule_id = schedule.task_schedule_id
+            schedule.delete()
+            self.scheduler.wait_for_changes()
+            self.assertNotIn(task_schedule_id, self.scheduler.wheel)
+        finally:
+            self.scheduler.unlisten()
+
+
+class RunSchedulerCommandTestCase(TestCase):
+    @patch("tasks.management.commands.run_scheduler.time.sleep")
+    @patch("tasks.management.commands.run_scheduler.Scheduler")
+    def test_command_reconnects_when_the_database_fails(
+        self, scheduler_mock, sleep_mock
+    ) -> None:
+        scheduler = scheduler_mock.return_value
+        scheduler.connect.side_effect = [2, OperationalError, 3]
+        scheduler.run_pending.side_effect = [
+            InterfaceError,
+            (1, 1),
+            KeyboardInterrupt,
+        ]
+        stdout = StringIO()
+
+        with (
+            self.assertLogs(
+                "tasks.management.commands.run_scheduler", level="WARNING"
+            ) as logs,
+            self.assertRaises(KeyboardInterrupt),
+        ):
+            call_command("run_scheduler", stdout=stdout)
+
+        self.assertEqual(len(logs.output), 2)
+        self.assertEqual(sleep_mock.call_args_list, [call(1.0), call(2.0)])
+        self.assertEqual(scheduler.connect.call_count, 3)
+        scheduler.wait_for_changes.assert_called_once()
+        scheduler.unlisten.assert_called_once()
+        self.assertIn("Loaded 3 upcoming runs.", stdout.getvalue())
+        self.assertIn("Processed 1 schedules and created 1 tasks.", stdout.getvalue())
+
+
+class TimingWheelTestCase(TestCase):
+    def setUp(self) -> None:
+        # Half a second after midnight
+        self.start = 86400 * 12 + 0.5
+        self.wheel = TimingWheel(self.start)
+
+    def test_keys_are_due_at_their_exact_time(self) -> None:
+        delays = {
+            "now": 0,
+            "second": 0.7,
+            "minute": 61.2,
+            "hour": 3600 * 3 + 5,
+            "day": 86400 * 2 + 3600 * 5 + 60 * 7 + 9.5,
+            "overflow": 86400 * 400,
+        }
+        for key, delay in delays.items():
+            self.wheel.add(key, self.start + delay)
+
+        for key, delay in sorted(delays.items(), key=lambda item: item[1]):
+            self.assertEqual(self.wheel.advance(self.start + delay - 0.1), [])
+            self.assertEqual(self.wheel.advance(self.start + delay), [key])
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_past_keys_are_due_right_away(self) -> None:
+        self.wheel.add("late", self.start - 3600)
+
+        self.assertEqual(self.wheel.advance(self.start), ["late"])
+
+    def test_cancel_and_move_keys(self) -> None:
+        self.wheel.add("cancelled", self.start + 3600)
+        self.wheel.add("moved", self.start + 3600)
+        self.wheel.add("moved", self.start + 10)
+
+        self.assertTrue(self.wheel.cancel("cancelled"))
+        self.assertFalse(self.wheel.cancel("cancelled"))
+        self.assertEqual(self.wheel.advance(self.start + 10), ["moved"])
+        self.assertEqual(self.wheel.advance(self.start + 7200), [])
+
+    def test_next_due_at(self) -> None:
+        self.assertIsNone(self.wheel.next_due_at())
+
+        self.wheel.add("hour", self.start + 3600 + 30)
+        # When the slot of the hour is reached and its keys are moved down
+        self.assertEqual(self.wheel.next_due_at(), 86400 * 12 + 3600)
+
+        self.wheel.add("second", self.start + 1.25)
+        self.assertEqual(self.wheel.next_due_at(), self.start + 1.25)
+
+
+class TaskListSerializerTestCase(TestCase):
+    def tearDown(self) -> None:
+        Task.objects.all().delete()
+        TaskSchedule.objects.all().delete()
+
+    @parameterized.expand(
+        [
+            ({"operation": "1+2", "priority": 3},),
+            ({"operation": " 1+2 ", "priority": "4"},),
+            ({"operation": "1+2", "priority": 5.0},),
+            ({"operation": "1+2", "priority": None},),
+            ({"operation": "1+2", "status": "SUCCESS"},),
+            ({},),
+            ({"operation": None},),
+            ({"operation": "  "},),
+            ({"operation": True},),
+            ({"operation": ["1+2"]},),
+            ({"operation": "1-2", "priority": 10},),
+            ({"operation": "1+2", "priority": -1},),
+            ({"operation": "1+2", "priority": "high"},),
+            ({"operation": "1+2", "priority": 1.5},),
+            ({"operation": "1+2", "priority": True},),
+            ("1+2",),
+            ([{"operation": "1+2"}],),
+        ]
+    )
+    def test_validation_matches_task_serializer(self, data: Any) -> None:
+        serializer = TaskSerializer(data=data)
+        list_serializer = TaskSerializer(data=[data], many=True)
+
+        self.assertTrue(list_serializer.is_valid())
+        if serializer.is_valid():
+            self.assertEqual(list_serializer.item_errors, [])
+            self.assertEqual(
+                list_serializer.validated_data,
+                [TaskData(**serializer.validated_data)],
+            )
+        else:
+            self.assertEqual(
+                list_serializer.item_errors, [{"index": 0, "errors": serializer.errors}]
+            )
+
+    def test_representation_matches_task_serializer(self) -> None:
+        task_schedule = TaskSchedule.objects.create(
+            operation="1+2", every_x_days=1, schedule_x_times=1
+        )
+        Task.objects.create(operation="1+2", priority=1)
+        Task.objects.create(
+            operation="1+2",
+            priority=2,
+            status=TaskStatus.SUCCESS,
+            result=3,
+            task_schedule=task_schedule,
+        )
+        tasks = list(Task.objects.order_by("task_id"))
+
+        expected_data = [TaskSerializer(task).data for task in tasks]
+        self.assertEqual(TaskSerializer(tasks, many=True).data, expected_data)
+        self.assertEqual(
+            [list(task) for task in TaskSerializer(tasks, many=True).data],
+            [list(task) for task in expected_data],
+        )
+        self.assertEqual(
+            TaskSerializer(
+                Task.objects.order_by("task_id").values(*TASK_FIELDS), many=True
+            ).data,
+            expected_data,
+        )
+
+
+class OperationsTestCase(TestCase):
+    @parameterized.expand(
+        [
+            ("1+1", (1.0, 1.0)),
+            ("1.5+2+3.25", (1.5, 2.0, 3.25)),
+            ("1", None),
+            ("1+", None),
+            ("-1+1", None),
+            ("1e3+1", None),
+            ("invalid+operation", None),
+        ]
+    )
+    def test_parse_operation(
+        self, operation: str, expected_terms: tuple[float, ...] | None
+    ) -> None:
+        self.assertEqual(parse_operation(operation), expected_terms)
+
+    def test_evaluate_operation(self) -> None:
+        self.assertEqual(evaluate_operation("1.5+2+3.25"), 6.75)
+
+    def test_evaluate_operation_is_cached(self) -> None:
+        evaluate_operation("4+7")
+        hits = evaluate_operation.cache_info().hits
+
+        evaluate_operation("4+7")
+
+        self.assertEqual(evaluate_operation.cache_info().hits, hits + 1)
+
+    def test_evaluate_invalid_operation(self) -> None:
+        with self.assertRaises(ValueError):
+            evaluate_operation("invalid+operation")
+
+
+class ResultCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        self.redis = MagicMock()
+        self.cache = ResultCache()
+        self.cache._redis = self.redis
+
+    def test_local_hit(self) -> None:
+        self.cache.set_local({"1+1": 2.0})
+
+        self.assertEqual(self.cache.get_many(["1+1"]), {"1+1": 2.0})
+        self.redis.mget.assert_not_called()
+        self.assertEqual(self.cache.counters["local_hits"], 1)
+
+    def test_redis_hit_populates_local_tier(self) -> None:
+        self.redis.mget.return_value = [b"3.0", None]
+
+        self.assertEqual(self.cache.get_many(["1+2", "2+2"]), {"1+2": 3.0})
+        self.redis.mget.assert_called_once_with(
+            ["tasks:result:1+2", "tasks:result:2+2"]
+        )
+        self.assertIn("1+2", self.cache.local)
+        self.assertEqual(self.cache.counters["redis_hits"], 1)
+        self.assertEqual(self.cache.counters["misses"], 1)
+
+    def test_redis_error_is_a_miss(self) -> None:
+        self.redis.mget.side_effect = redis.ConnectionError()
+
+        self.assertEqual(self.cache.get_many(["1+1"]), {})
+        self.assertEqual(self.cache.counters["misses"], 1)
+
+    @override_settings(TASKS_RESULT_CACHE_TTL=10)
+    @patch("tasks.result_cache.time.monotonic")
+    def test_local_entries_expire(self, monotonic_mock) -> None:
+        self.redis.mget.return_value = [None]
+        monotonic_mock.return_value = 100
+        self.cache.set_local({"1+1": 2.0})
+
+        monotonic_mock.return_value = 110
+
+        self.assertEqual(self.cache.get_many(["1+1"]), {})
+        self.assertNotIn("1+1", self.cache.local)
+
+    @override_settings(TASKS_RESULT_CACHE_LOCAL_SIZE=2)
+    def test_least_recently_used_entries_are_evicted(self) -> None:
+        self.cache.set_local({"1+1": 2.0, "1+2": 3.0})
+        self.cache.get_many(["1+1"])
+
+        self.cache.set_local({"1+3": 4.0})
+
+        self.assertEqual(list(self.cache.local), ["1+1", "1+3"])
+
+    def test_set_many_writes_both_tiers(self) -> None:
+        pipeline = self.redis.pipeline.return_value.__enter__.return_value
+
+        self.cache.set_many({"1+1": 2.0})
+
+        self.assertIn("1+1", self.cache.local)
+        pipeline.set.assert_called_once_with("tasks:result:1+1", 2.0, ex=3600)
+        pipeline.execute.assert_called_once()
+
+
+class EvaluateDueTestCase(TestCase):
+    def test_evaluate_due_matches_handler_chain(self) -> None:
+        current_time = now()
+        schedules = []
+        last_created_at = []
+        counts = []
+        for every_x_days in (None, 1, 2):
+            for every_x_hours in (None, 1, 30):
+                for last_task_age in (None, timedelta(hours=2), timedelta(days=2)):
+                    for tasks_count in (0, 3):
+                        schedule = TaskSchedule(
+                            operation="1+1",
+                            every_x_days=every_x_days,
+                            every_x_hours=every_x_hours,
+                            schedule_x_times=2,
+                        )
+                        schedule.tasks_created = tasks_count
+                        schedules.append(schedule)
+                        last_created_at.append(
+                            current_time - last_task_age if last_task_age else None
+                        )
+                        counts.append(tasks_count)
+
+        self.assertEqual(
+            evaluate_due(schedules, last_created_at, counts, current_time),
+            [
+                task_creation_check_chain.handle(
+                    schedule, last_task_created_at, current_time
+                )
+                for schedule, last_task_created_at in zip(schedules, last_created_at)
+            ],
+        )
+
+
+class TaskEventsTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.pubsub = MagicMock()
+        self.pubsub.subscribe = AsyncMock()
+        self.pubsub.get_message = AsyncMock(return_value=None)
+        self.pubsub.aclose = AsyncMock()
+        client = MagicMock(aclose=AsyncMock())
+        client.pubsub.return_value = self.pubsub
+        patcher = patch("tasks.events.async_redis.Redis.from_url", return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_events(self, *args: Any, **kwargs: Any) -> list[bytes]:
+        async def read() -> list[bytes]:
+            return [event async for event in stream_task_events(*args, **kwargs)]
+
+        return async_to_sync(read)()
+
+    def test_publish(self) -> None:
+        publisher = TaskEventPublisher()
+        publisher._redis = MagicMock()
+        pipeline = publisher._redis.pipeline.return_value.__enter__.return_value
+        task = Task(task_id=1, status=TaskStatus.SUCCESS, result=2, task_schedule_id=3)
+
+        publisher.publish([task])
+
+        message = json.dumps(
+            {"task_id": 1, "status": "SUCCESS", "result": 2, "task_schedule": 3}
+        )
+        self.assertEqual(
+            pipeline.publish.call_args_list,
+            [
+                call("tasks:events:task:1", message),
+                call("tasks:events:task-schedule:3", message),
+            ],
+        )
+        pipeline.execute.assert_called_once()
+
+    def test_publish_redis_unavailable(self) -> None:
+        publisher = TaskEventPublisher()
+        publisher._redis = MagicMock()
+        publisher._redis.pipeline.side_effect = redis.ConnectionError
+
+        publisher.publish([Task(task_id=1, status=TaskStatus.STARTED)])
+
+    def test_stream_until_tasks_are_finished(self) -> None:
+        pending_task = Task.objects.create(operation="1+1", priority=1)
+        finished_task = Task.objects.create(
+            operation="1+1", priority=1, status=TaskStatus.SUCCESS, result=2
+        )
+        self.pubsub.get_message.side_effect = [
+            None,
+            {
+                "data": json.dumps(
+                    {
+                        "task_id": pending_task.task_id,
+                        "status": "SUCCESS",
+                        "result": 2,
+                        "task_schedule": None,
+                    }
+                )
+            },
+        ]
+
+        events = self.read_events([pending_task.task_id, finished_task.task_id])
+
+        self.pubsub.subscribe.assert_awaited_once_with(
+            f"tasks:events:task:{pending_task.task_id}",
+            f"tasks:events:task:{finished_task.task_id}",
+        )
+        self.assertEqual(
+            [json.loads(event.split(b"data: ")[1]) for event in events[:2]],
+            [
+                {
+                    "task_id": pending_task.task_id,
+                    "status": "PENDING",
+                    "result": None,
+                    "task_schedule": None,
+                },
+                {
+                    "task_id": finished_task.task_id,
+                    "status": "SUCCESS",
+                    "result": 2.0,
+                    "task_schedule": None,
+                },
+            ],
+        )
+        self.assertEqual(events[2], b": heartbeat\n\n")
+        self.assertIn(b'"status": "SUCCESS"', events[3])
+        self.assertEqual(len(events), 4)
+        self.pubsub.aclose.assert_awaited_once()
+
+    def test_stream_finished_tasks(self) -> None:
+        task = Task.objects.create(operation="1+1", priority=1, status=TaskStatus.ERROR)
+
+        events = self.read_events([task.task_id])
+
+        self.assertEqual(len(events), 1)
+        self.pubsub.get_message.assert_not_awaited()
+
+    @override_settings(TASKS_EVENTS_TIMEOUT=0.05, TASKS_EVENTS_HEARTBEAT=0.01)
+    def test_stream_task_schedule_until_timeout(self) -> None:
+        task_schedule = TaskSchedule.objects.create(
+            operation="1+1", every_x_days=1, schedule_x_times=1
+        )
+
+        async def get_message(**kwargs: Any) -> None:
+            await asyncio.sleep(kwargs["timeout"])
+
+        self.pubsub.get_message.side_effect = get_message
+
+        events = self.read_events(task_schedule_id=task_schedule.task_schedule_id)
+
+        self.pubsub.subscribe.assert_awaited_once_with(
+            f"tasks:events:task-schedule:{task_schedule.task_schedule_id}"
+        )
+        self.assertTrue(events)
+        self.assertTrue(all(event == b": heartbeat\n\n" for event in events))
+
+    @parameterized.expand(
+        [
+            ("",),
+            ("?task_ids=1&task_schedule=1",),
+            ("?task_ids=1,one",),
+        ]
+    )
+    def test_events_invalid_params(self, query: str) -> None:
+        response = self.client.get(reverse("task-events") + query)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,145 @@
+import math
+from typing import Hashable
+
+# Slots of the wheels of the seconds, minutes, hours and days, with the default resolution
+WHEEL_SIZES = (60, 60, 24, 365)
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel keeping the due time of a large number of keys.
+
+    Every wheel splits the span of a slot of the wheel below it, so a key is stored in the
+    lowest wheel whose current rotation contains its due time. When the time reaches a slot of
+    an upper wheel, its keys are moved to the wheels below, closer to their due time. Adding
+    and cancelling a key is O(1) and advancing costs O(1) per tick plus the moved keys, instead
+    of rebuilding or scanning all the keys. Keys due beyond the last wheel are kept aside until
+    its rotation ends.
+
+    The due times are timestamps in seconds and a tick lasts the resolution. The keys of the
+    current tick are returned as soon as they are due, so the precision isn't limited by it.
+    """
+
+    def __init__(
+        self,
+        start: float,
+        resolution: float = 1.0,
+        wheel_sizes: tuple[int, ...] = WHEEL_SIZES,
+    ) -> None:
+        self.resolution = resolution
+        self.wheel_sizes = wheel_sizes
+        # Number of ticks covered by a slot of every wheel, the last one covers a whole rotation
+        self.spans = [1]
+        for size in wheel_sizes:
+            self.spans.append(self.spans[-1] * size)
+        self.wheels: list[list[dict[Hashable, float]]] = [
+            [{} for _ in range(size)] for size in wheel_sizes
+        ]
+        self.overflow: dict[Hashable, float] = {}
+        # Slot of every key, so it can be cancelled without searching for it
+        self.slots: dict[Hashable, dict[Hashable, float]] = {}
+        self.current_tick = self.tick(start)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.slots
+
+    def tick(self, timestamp: float) -> int:
+        return math.floor(timestamp / self.resolution)
+
+    def slot(self, due_tick: int) -> dict[Hashable, float]:
+        due_tick = max(due_tick, self.current_tick)
+        for level, size in enumerate(self.wheel_sizes):
+            span = self.spans[level + 1]
+            if due_tick // span == self.current_tick // span:
+                return self.wheels[level][due_tick // self.spans[level] % size]
+        return self.overflow
+
+    def add(self, key: Hashable, due_at: float) -> None:
+        """Adds the key, or moves it if it was already added. Past due times are due right away."""
+        self.cancel(key)
+        slot = self.slot(self.tick(due_at))
+        slot[key] = due_at
+        self.slots[key] = slot
+
+    def cancel(self, key: Hashable) -> bool:
+        slot = self.slots.pop(key, None)
+        if slot is None:
+            return False
+        del slot[key]
+        return True
+
+    def redistribute(self, slot: dict[Hashable, float]) -> None:
+        entries = list(slot.items())
+        slot.clear()
+        for key, due_at in entries:
+            new_slot = self.slot(self.tick(due_at))
+            new_slot[key] = due_at
+            self.slots[key] = new_slot
+
+    def advance(self, timestamp: float) -> list[Hashable]:
+        """Moves the wheel to the timestamp and removes and returns the keys due by then."""
+        target_tick = self.tick(timestamp)
+        due_keys: list[Hashable] = []
+        if not self.slots:
+            self.current_tick = max(self.current_tick, target_tick)
+            return due_keys
+
+        while self.current_tick < target_tick:
+            slot = self.wheels[0][self.current_tick % self.wheel_sizes[0]]
+            for key in slot:
+                del self.slots[key]
+            due_keys.extend(slot)
+            slot.clear()
+
+            self.current_tick += 1
+            # Move the keys of the slots which are reached down, starting with the upper wheels
+            if self.current_tick % self.spans[-1] == 0:
+                self.redistribute(self.overflow)
+            for level in range(len(self.wheel_sizes) - 1, 0, -1):
+                if self.current_tick % self.spans[level] == 0:
+                    self.redistribute(
+                        self.wheels[level][
+                            self.current_tick
+                            // self.spans[level]
+                            % self.wheel_sizes[level]
+                        ]
+                    )
+
+        # The current tick is only partly over
+        slot = self.wheels[0][self.current_tick % self.wheel_sizes[0]]
+        for key in [key for key, due_at in slot.items() if due_at <= timestamp]:
+            del slot[key]
+            del self.slots[key]
+            due_keys.append(key)
+        return due_keys
+
+    def next_due_at(self) -> float | None:
+        """
+        Returns when advance() should be called next: the exact due time when the next keys are
+        in the lowest wheel, otherwise the time their slot is reached and they are moved down.
+        """
+        if not self.slots:
+            return None
+
+        current_slot = self.wheels[0][self.current_tick % self.wheel_sizes[0]]
+        if current_slot:
+            return min(current_slot.values())
+        for level, size in enumerate(self.wheel_sizes):
+            index = self.current_tick // self.spans[level] % size
+            for next_index in range(index + 1, size):
+                slot = self.wheels[level][next_index]
+                if slot:
+                    if level == 0:
+                        return min(slot.values())
+                    span_start = self.current_tick // self.spans[level + 1]
+                    return (
+                        (span_start * size + next_index)
+                        * self.spans[level]
+                        * self.resolution
+                    )
+        return (
+            (self.current_tick // self.spans[-1] + 1) * self.spans[-1] * self.resolution
+        )
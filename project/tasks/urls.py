@@ -1,12 +1,25 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from tasks import views
+from tasks import async_views, views
 
 router = DefaultRouter()
 router.register(r"tasks", views.TaskViewSet, basename="task")
 router.register(r"task-schedules", views.TaskScheduleViewSet, basename="task-schedule")
 
 urlpatterns = [
+    # Registered before the router, which would handle it as a task id
+    path("tasks/events/", views.task_events, name="task-events"),
     path("", include(router.urls)),
+    path("async/tasks/", async_views.create_task, name="async-task-list"),
+    path(
+        "async/tasks/batch-request/",
+        async_views.batch_request,
+        name="async-task-batch-request",
+    ),
+    path(
+        "async/tasks/<int:task_id>/",
+        async_views.retrieve_task,
+        name="async-task-detail",
+    ),
 ]
@@ -1,8 +1,19 @@
-from typing import Any
+import json
+from itertools import islice
+from typing import Any, Iterable, Iterator
 
-from celery import group
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
-from django.db.transaction import on_commit
+from django.db.models import QuerySet
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.views.decorators.http import require_GET
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import viewsets, mixins, status
@@ -10,16 +21,45 @@ from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 
+from tasks.dispatch import DispatchMode, dispatch_tasks
+from tasks.events import stream_task_events
+from tasks.filters import TaskFilterBackend, TaskScheduleFilterBackend
 from tasks.models import Task, TaskSchedule, TaskStatus
-from tasks.serializers import TaskSerializer, TaskScheduleSerializer
+from tasks.pagination import TaskCursorPagination, TaskScheduleCursorPagination
+from tasks.parsers import NDJSONParser
+from tasks.serializers import (
+    TASK_FIELDS,
+    TASK_STATUS_FIELDS,
+    TaskIdsSerializer,
+    TaskSerializer,
+    TaskScheduleSerializer,
+)
 
-from core.tasks import process_task
+dispatch_parameter = openapi.Parameter(
+    "dispatch",
+    openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    enum=list(DispatchMode),
+    description="Send a message per task or per batch of tasks with the same priority",
+)
 
 
-class TaskViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+class TaskViewSet(
+    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
+    filter_backends = [TaskFilterBackend]
+    pagination_class = TaskCursorPagination
+
+    def get_queryset(self) -> QuerySet[Task]:
+        queryset = super().get_queryset()
+        if self.action == "list":
+            # Only the serialized columns are read, as plain rows output by TaskListSerializer
+            queryset = queryset.values(*TASK_FIELDS)
+        return queryset
 
     def create(self, request: Request, *args, **kwargs) -> Response:
         serializer = self.get_serializer(data=request.data)
@@ -27,27 +67,42 @@ class TaskViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
 
         with transaction.atomic():
             task = serializer.save()
-            on_commit(
-                lambda: process_task.apply_async(
-                    args=[task.task_id], priority=task.priority
-                )
-            )
+            dispatch_tasks([task], DispatchMode.SINGLE)
 
         return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
     def destroy(self, request: Request, *args: Any, **kwargs: Any) -> Response:
-        task = self.get_object()
-        if task.status != TaskStatus.PENDING:
+        # Only pending tasks are deleted, in a single statement, so a worker can't start them in the meantime
+        try:
+            deleted, _ = Task.objects.filter(
+                task_id=kwargs[self.lookup_field], status=TaskStatus.PENDING
+            ).delete()
+        except (TypeError, ValueError, DjangoValidationError):
+            raise Http404
+
+        if not deleted:
+            self.get_object()
             raise ValidationError("Cannot delete a task which is processed.")
-        task.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def get_dispatch_mode(self) -> DispatchMode | None:
+        dispatch_mode = self.request.query_params.get("dispatch")
+        if dispatch_mode is None:
+            return None
+        try:
+            return DispatchMode(dispatch_mode)
+        except ValueError:
+            raise ValidationError(
+                f"Dispatch must be one of: {', '.join(DispatchMode)}."
+            )
+
     @swagger_auto_schema(
         operation_summary="Batch create tasks",
         operation_description=(
             "Creates multiple tasks (up to 100) and triggers their processing. "
             "Each task must include an operation and an optional priority."
         ),
+        manual_parameters=[dispatch_parameter],
         request_body=openapi.Schema(
             type=openapi.TYPE_ARRAY,
             items=openapi.Schema(
@@ -99,46 +154,174 @@ class TaskViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
         if not isinstance(tasks_data, list) or len(tasks_data) > 100:
             raise ValidationError("Request body must be a list of up to 100 tasks.")
 
-        created_tasks = []
-        errors = []
+        dispatch_mode = self.get_dispatch_mode()
+        serializer = self.get_serializer(data=tasks_data, many=True)
+        serializer.is_valid(raise_exception=True)
+
         with transaction.atomic():
             """
             Creates tasks in a batch and triggers their processing as a group.
 
-            - Validates and saves each task from the provided data.
-            - Ensures atomicity, so either all tasks are created or none.
-            - Groups the tasks for asynchronous processing using Celery.
+            - Validates every task and inserts the valid ones with a single query.
+            - Ensures atomicity, so either all valid tasks are created or none.
+            - Writes the messages sending the tasks to processing in the outbox.
             """
-            for index, task_data in enumerate(tasks_data):
-                serializer = self.get_serializer(data=task_data)
-                if serializer.is_valid():
-                    task = serializer.save()
-                    created_tasks.append(task)
-                else:
-                    errors.append({"index": index, "errors": serializer.errors})
-
-            if created_tasks:
-                task_group = group(
-                    process_task.s(task.task_id).set(priority=task.priority)
-                    for task in created_tasks
-                )
-                on_commit(task_group.apply_async)
-
-        response_data = {"tasks": self.get_serializer(created_tasks, many=True).data}
-        if errors:
-            response_data["errors"] = errors
+            created_tasks = serializer.save()
+
+            dispatch_tasks(created_tasks, dispatch_mode)
+
+        response_data = {"tasks": serializer.data}
+        if serializer.item_errors:
+            response_data["errors"] = serializer.item_errors
 
         return Response(
             response_data,
             status=(
                 status.HTTP_202_ACCEPTED
-                if len(created_tasks) > 0 or len(errors) == 0
+                if len(created_tasks) > 0 or len(serializer.item_errors) == 0
                 else status.HTTP_400_BAD_REQUEST
             ),
         )
 
+    @swagger_auto_schema(
+        operation_summary="Stream create tasks",
+        operation_description=(
+            "Creates tasks from a newline delimited JSON body, one task per line, and triggers "
+            "their processing. The tasks are validated and inserted in chunks and each chunk is "
+            "sent to processing after its commit. The response streams a JSON line per request "
+            "line, containing either the created task or its validation errors."
+        ),
+        manual_parameters=[dispatch_parameter],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_STRING,
+            description='Task per line, e.g. {"operation": "1+1", "priority": 5}',
+        ),
+        responses={200: "Newline delimited JSON results"},
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="batch-stream",
+        parser_classes=[NDJSONParser],
+    )
+    def batch_stream(
+        self, request: Request, *args: Any, **kwargs: Any
+    ) -> StreamingHttpResponse:
+        return StreamingHttpResponse(
+            self.stream_tasks(request.data, self.get_dispatch_mode()),
+            content_type=NDJSONParser.media_type,
+        )
+
+    def stream_tasks(
+        self, lines: Iterable[bytes], dispatch_mode: DispatchMode | None
+    ) -> Iterator[bytes]:
+        numbered_lines = (
+            (line_number, line)
+            for line_number, line in enumerate(lines, start=1)
+            if line.strip()
+        )
+        while chunk := list(islice(numbered_lines, settings.TASKS_STREAM_CHUNK_SIZE)):
+            yield from self.create_tasks_chunk(chunk, dispatch_mode)
+
+    def create_tasks_chunk(
+        self, chunk: list[tuple[int, bytes]], dispatch_mode: DispatchMode | None
+    ) -> Iterator[bytes]:
+        results: dict[int, dict] = {}
+        line_numbers = []
+        tasks_data = []
+        for line_number, line in chunk:
+            try:
+                tasks_data.append(json.loads(line))
+                line_numbers.append(line_number)
+            except ValueError:
+                results[line_number] = {"line": line_number, "errors": "Invalid JSON."}
+
+        serializer = self.get_serializer(data=tasks_data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            created_tasks = serializer.save()
+            dispatch_tasks(created_tasks, dispatch_mode)
+
+        for item_errors in serializer.item_errors:
+            line_number = line_numbers[item_errors["index"]]
+            results[line_number] = {
+                "line": line_number,
+                "errors": item_errors["errors"],
+            }
+        created_line_numbers = (
+            line_number for line_number in line_numbers if line_number not in results
+        )
+        for line_number, task_data in zip(created_line_numbers, serializer.data):
+            results[line_number] = {"line": line_number, "task": task_data}
+
+        for line_number, _ in chunk:
+            yield json.dumps(results[line_number], cls=JSONEncoder).encode() + b"\n"
+
+    @swagger_auto_schema(
+        operation_summary="Bulk task status",
+        operation_description=(
+            f"Returns the status and result of up to {settings.TASKS_BULK_STATUS_MAX_IDS} "
+            "tasks with a single query. Ids of tasks which don't exist are listed in not_found."
+        ),
+        request_body=TaskIdsSerializer,
+        responses={
+            200: openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "tasks": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "task_id": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "status": openapi.Schema(type=openapi.TYPE_STRING),
+                                "result": openapi.Schema(
+                                    type=openapi.TYPE_NUMBER, x_nullable=True
+                                ),
+                            },
+                        ),
+                    ),
+                    "not_found": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                    ),
+                },
+            ),
+            400: "Bad Request",
+        },
+    )
+    @action(detail=False, methods=["post"], url_path="bulk-status")
+    def bulk_status(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        serializer = TaskIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        task_ids = set(serializer.validated_data["task_ids"])
+
+        # Only the reported columns are read and the rows are returned as they are
+        tasks = list(
+            Task.objects.filter(task_id__in=task_ids)
+            .order_by("task_id")
+            .values(*TASK_STATUS_FIELDS)
+        )
+        found_task_ids = {task["task_id"] for task in tasks}
+
+        return Response(
+            {
+                "tasks": tasks,
+                "not_found": sorted(task_ids - found_task_ids),
+            }
+        )
+
+    @swagger_auto_schema(
+        operation_summary="List tasks",
+        operation_description="Lists the tasks, latest first, using cursor pagination.",
+        manual_parameters=TaskFilterBackend.parameters,
+    )
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return super().list(request, *args, **kwargs)
+
 
 class TaskScheduleViewSet(
+    mixins.ListModelMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
     mixins.DestroyModelMixin,
@@ -146,6 +329,25 @@ class TaskScheduleViewSet(
 ):
     queryset = TaskSchedule.objects.all()
     serializer_class = TaskScheduleSerializer
+    filter_backends = [TaskScheduleFilterBackend]
+    pagination_class = TaskScheduleCursorPagination
+
+    def get_queryset(self) -> QuerySet[TaskSchedule]:
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            queryset = queryset.with_latest_tasks()
+        return queryset
+
+    @swagger_auto_schema(
+        operation_summary="List task schedules",
+        operation_description=(
+            "Lists the task schedules with their latest tasks, latest first, "
+            "using cursor pagination."
+        ),
+        manual_parameters=TaskScheduleFilterBackend.parameters,
+    )
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return super().list(request, *args, **kwargs)
 
     def create(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         serializer = self.get_serializer(data=request.data)
@@ -155,3 +357,74 @@ class TaskScheduleViewSet(
             self.get_serializer(task_schedule).data,
             status=status.HTTP_202_ACCEPTED,
         )
+
+    @swagger_auto_schema(
+        operation_summary="List the tasks of a schedule",
+        operation_description="Lists the tasks created by the schedule, latest first, using cursor pagination.",
+        manual_parameters=TaskFilterBackend.parameters,
+        responses={200: TaskSerializer(many=True)},
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="tasks",
+        filter_backends=[],
+    )
+    def tasks(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        task_schedule = self.get_object()
+        paginator = TaskCursorPagination()
+        tasks = paginator.paginate_queryset(
+            TaskFilterBackend().filter_queryset(
+                request,
+                Task.objects.filter(task_schedule=task_schedule).values(*TASK_FIELDS),
+                self,
+            ),
+            request,
+            view=self,
+        )
+        return paginator.get_paginated_response(TaskSerializer(tasks, many=True).data)
+
+
+@require_GET
+async def task_events(request: HttpRequest) -> HttpResponse:
+    """
+    Streams the status transitions of the tasks in ?task_ids=1,2,3, or of the tasks of
+    ?task_schedule=1, as server-sent events. Meant to be served by an ASGI server.
+    """
+    task_ids_param = request.GET.get("task_ids")
+    task_schedule_param = request.GET.get("task_schedule")
+    if (task_ids_param is None) == (task_schedule_param is None):
+        return JsonResponse(
+            {"detail": "Either task_ids or task_schedule must be provided."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        task_ids = (
+            [int(task_id) for task_id in task_ids_param.split(",")]
+            if task_ids_param is not None
+            else None
+        )
+        task_schedule_id = (
+            int(task_schedule_param) if task_schedule_param is not None else None
+        )
+    except ValueError:
+        return JsonResponse(
+            {"detail": "Task ids and task schedule must be integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if task_ids is not None and len(task_ids) > settings.TASKS_BULK_STATUS_MAX_IDS:
+        return JsonResponse(
+            {
+                "detail": f"Up to {settings.TASKS_BULK_STATUS_MAX_IDS} task ids can be streamed at once."
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    response = StreamingHttpResponse(
+        stream_task_events(task_ids, task_schedule_id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Don't let a proxy buffer the events
+    return response